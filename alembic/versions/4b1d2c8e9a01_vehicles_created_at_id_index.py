@@ -0,0 +1,30 @@
+"""vehicles createdAt id index
+
+Revision ID: 4b1d2c8e9a01
+Revises: 
+Create Date: 2026-10-18 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1d2c8e9a01'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build the index without locking writes on a large vehicles table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_vehicles_createdAt_id', 'vehicles', ['createdAt', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_vehicles_createdAt_id', table_name='vehicles', postgresql_concurrently=True)
@@ -0,0 +1,45 @@
+"""vehicle counts rollup
+
+Revision ID: 7c3e5f1a2b44
+Revises: 4b1d2c8e9a01
+Create Date: 2026-10-18 11:40:02.553871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5f1a2b44'
+down_revision: Union[str, None] = '4b1d2c8e9a01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('vehicles', sa.Column('camera', sa.String(), nullable=True))
+    op.create_table(
+        'vehicle_counts',
+        sa.Column('bucket', sa.String(), nullable=False),
+        sa.Column('camera', sa.String(), nullable=False),
+        sa.Column('direction', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'camera', 'direction', 'bucket_start'),
+    )
+    # Backfill the rollup once from the existing events
+    for bucket in ('minute', 'hour', 'day'):
+        op.execute(f"""
+            INSERT INTO vehicle_counts (bucket, camera, direction, bucket_start, count)
+            SELECT '{bucket}', COALESCE(camera, 'unknown'), direction, date_trunc('{bucket}', "createdAt"), COUNT(*)
+            FROM vehicles
+            WHERE direction IS NOT NULL
+            GROUP BY 2, 3, 4
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('vehicle_counts')
+    op.drop_column('vehicles', 'camera')
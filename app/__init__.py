@@ -1,2 +1,10 @@
-from .main import app
-from .models import Vehicle, User
\ No newline at end of file
+# Import lazily so that scripts using helpers such as ``app.capture`` do not
+# start the API (and its video processor) as a side effect.
+def __getattr__(name):
+    if name == "app":
+        from .main import app
+        return app
+    if name in ("Vehicle", "User"):
+        from . import models
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
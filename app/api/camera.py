@@ -0,0 +1,111 @@
+# app/api/camera.py
+from contextlib import aclosing
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .. import config
+from ..zone_config import DEFAULT_RULES, DEFAULT_ZONES, VersionConflict, ZoneStore
+
+router = APIRouter()
+zone_store = ZoneStore(config.ZONES_DIR)
+
+class ZoneConfigUpdate(BaseModel):
+    zones: Dict[str, List[List[float]]]
+    rules: Optional[List[dict]] = None  # None: camera keeps its default rules
+    version: Optional[int] = None  # version being edited; 409 if another one was saved since
+
+def get_supervisor(request: Request):
+    return request.app.state.supervisor
+
+def check_camera(name: str, supervisor):
+    if name not in supervisor.worker_names:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+def check_zone_camera(name: str):
+    if name not in config.CAMERAS:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+def preview_fps(fps):
+    # Mỗi client có thể xin ít khung hình hơn, nhưng không nhiều hơn worker mã hoá
+    return min(fps or config.PREVIEW_FPS, config.PREVIEW_FPS)
+
+@router.get("/")
+def camera_status(supervisor=Depends(get_supervisor)):
+    return supervisor.status()
+
+@router.post("/{name}/start")
+def start_camera(name: str, supervisor=Depends(get_supervisor)):
+    check_camera(name, supervisor)
+    supervisor.start(name)
+    return supervisor.status()[supervisor.worker_names[name]]
+
+@router.post("/{name}/stop")
+def stop_camera(name: str, supervisor=Depends(get_supervisor)):
+    check_camera(name, supervisor)
+    supervisor.stop(name)
+    return supervisor.status()[supervisor.worker_names[name]]
+
+async def mjpeg_parts(frames):
+    async with aclosing(frames):
+        async for jpeg in frames:
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                   + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+
+@router.get("/{name}/preview.mjpg")
+def preview_mjpeg(name: str, fps: float = Query(None, gt=0), supervisor=Depends(get_supervisor)):
+    # Xem trực tiếp trên trình duyệt: <img src="/cameras/cam_truoc/preview.mjpg?fps=5">
+    if name not in supervisor.preview.viewers:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    frames = supervisor.preview.frames(name, preview_fps(fps))
+    return StreamingResponse(mjpeg_parts(frames), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@router.websocket("/{name}/preview/ws")
+async def preview_websocket(websocket: WebSocket, name: str, fps: float = Query(None, gt=0)):
+    # Mỗi message là một ảnh JPEG; client chậm sẽ bị bỏ khung hình chứ không bị dồn hàng đợi
+    supervisor = websocket.app.state.supervisor
+    if name not in supervisor.preview.viewers:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async with aclosing(supervisor.preview.frames(name, preview_fps(fps))) as frames:
+            async for jpeg in frames:
+                await websocket.send_bytes(jpeg)
+    except WebSocketDisconnect:
+        pass
+
+@router.get("/{name}/zones")
+def get_zones(name: str):
+    # Cấu hình khu vực hiện tại; version 0 là cấu hình mặc định khi chưa lưu lần nào
+    check_zone_camera(name)
+    return zone_store.load(name) or {"version": 0, "updated_at": None, "zones": DEFAULT_ZONES, "rules": None}
+
+@router.put("/{name}/zones")
+def put_zones(name: str, update: ZoneConfigUpdate):
+    # Lưu thành phiên bản mới; worker đang chạy áp dụng nó giữa hai khung hình (trong khoảng 1 giây)
+    check_zone_camera(name)
+    # Không gửi rules: khu vực phải dùng được với luật đếm của camera (rules trong CAMERAS hoặc mặc định)
+    default_rules = config.CAMERAS[name].get("rules") or DEFAULT_RULES
+    try:
+        return zone_store.save(name, update.zones, update.rules, expected_version=update.version,
+                               default_rules=default_rules)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/{name}/zones/versions")
+def list_zone_versions(name: str):
+    check_zone_camera(name)
+    return {"versions": zone_store.versions(name)}
+
+@router.get("/{name}/zones/versions/{version}")
+def get_zone_version(name: str, version: int):
+    check_zone_camera(name)
+    zone_config = zone_store.load(name, version)
+    if zone_config is None:
+        raise HTTPException(status_code=404, detail="Zone configuration version not found")
+    return zone_config
@@ -0,0 +1,34 @@
+# app/api/stats.py
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Literal, Optional
+from ..models import VehicleCount
+from .vehicle import get_db, naive_utc
+
+router = APIRouter()
+
+class CountResponse(BaseModel):
+    camera: str
+    direction: str
+    bucket_start: datetime
+    count: int
+
+@router.get("/", response_model=List[CountResponse])
+async def get_stats(bucket: Literal["minute", "hour", "day"] = "hour", start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None, camera: Optional[str] = None,
+                    direction: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    # Đọc từ bảng vehicle_counts: một dòng cho mỗi (camera, hướng, khung thời gian)
+    query = select(VehicleCount).where(VehicleCount.bucket == bucket)
+    if camera is not None:
+        query = query.where(VehicleCount.camera == camera)
+    if direction is not None:
+        query = query.where(VehicleCount.direction == direction)
+    if start_date is not None:
+        query = query.where(VehicleCount.bucket_start >= naive_utc(start_date))
+    if end_date is not None:
+        query = query.where(VehicleCount.bucket_start <= naive_utc(end_date))
+    query = query.order_by(VehicleCount.bucket_start, VehicleCount.camera, VehicleCount.direction)
+    return (await db.scalars(query)).all()
@@ -1,11 +1,20 @@
 # app/api/vehicle.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..db import SessionLocal
+import base64
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import config
+from ..cache import TTLCache, make_generation
+from ..db import AsyncSessionLocal
 from ..models import Vehicle
-from pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
+from ..rollups import apply_rollups_async
+from pydantic import BaseModel, ValidationError, field_validator
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
@@ -13,6 +22,7 @@ class VehicleCreate(BaseModel):
     trackId: str
     direction: str
     image_path: str
+    camera: Optional[str] = None
 
 class VehicleResponse(BaseModel):
     id: int
@@ -20,35 +30,193 @@ class VehicleResponse(BaseModel):
     updatedAt: datetime
     trackId: str
     direction: str
-    image_path: str
+    image_path: Optional[str] = None  # None when the snapshot was dropped
+    camera: Optional[str] = None
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
+def naive_utc(value: Optional[datetime]):
+    # createdAt columns are TIMESTAMP WITHOUT TIME ZONE holding UTC; asyncpg refuses aware values for them
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+class VehicleBulkItem(VehicleCreate):
+    # Edge counters replaying a backlog send the original crossing time
+    createdAt: Optional[datetime] = None
+
+    @field_validator("createdAt")
+    @classmethod
+    def created_at_utc(cls, value):
+        # "2024-05-01T08:00:00Z" and "+07:00" offsets are stored as naive UTC
+        return naive_utc(value)
+
+class BulkError(BaseModel):
+    index: int
+    errors: List[dict]
+
+class BulkResult(BaseModel):
+    inserted: int
+    rejected: int
+    errors: List[BulkError]  # at most MAX_BULK_ERRORS are reported
+
+BULK_BATCH_SIZE = 1000
+MAX_BULK_ERRORS = 1000
+
+# Read cache for dashboard polling; invalidated on every vehicle write, including the camera workers'
+cache = TTLCache(config.CACHE_SIZE, config.CACHE_TTL, make_generation(config.CACHE_REDIS_URL))
+
+EXPORT_COLUMNS = ["id", "createdAt", "updatedAt", "trackId", "direction", "image_path", "camera"]
+
+# Dependency to get the database session (async, from the pooled asyncpg engine)
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def filter_by_date(query, start_date: Optional[datetime], end_date: Optional[datetime]):
+    # Either bound may be given on its own
+    start_date, end_date = naive_utc(start_date), naive_utc(end_date)
+    if start_date is not None:
+        query = query.where(Vehicle.createdAt >= start_date)
+    if end_date is not None:
+        query = query.where(Vehicle.createdAt <= end_date)
+    return query
+
+def encode_cursor(vehicle):
+    raw = f"{vehicle.createdAt.isoformat()}|{vehicle.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, vehicle_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(vehicle_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.post("/", response_model=VehicleResponse)
-def create_vehicle(vehicle: VehicleCreate, db: Session = Depends(get_db)):
+async def create_vehicle(vehicle: VehicleCreate, db: AsyncSession = Depends(get_db)):
     db_vehicle = Vehicle(**vehicle.dict())
+    db_vehicle.createdAt = db_vehicle.updatedAt = datetime.utcnow()
     db.add(db_vehicle)
-    db.commit()
-    db.refresh(db_vehicle)
+    await apply_rollups_async(
+        db, [{"createdAt": db_vehicle.createdAt, "direction": vehicle.direction, "camera": vehicle.camera}])
+    await db.commit()
+    await cache.ainvalidate()
+    await db.refresh(db_vehicle)
     return db_vehicle
 
+async def iter_bulk_items(request: Request):
+    # Yields (index, raw item): parsed objects from a JSON array, or raw lines of an NDJSON body,
+    # which is read chunk by chunk instead of being buffered whole
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        index, pending = 0, b""
+        async for chunk in request.stream():
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        if pending.strip():
+            yield index, pending
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for index, item in enumerate(items):
+        yield index, item
+
+async def insert_batch(db: AsyncSession, rows):
+    await db.execute(insert(Vehicle.__table__), rows)
+    await apply_rollups_async(db, rows)
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_vehicles_bulk(request: Request, db: AsyncSession = Depends(get_db)):
+    # Invalid rows are reported by index and skipped; valid rows are inserted in batches of
+    # BULK_BATCH_SIZE, all in one transaction
+    now = datetime.utcnow()
+    batch, errors = [], []
+    inserted = rejected = 0
+    async for index, raw in iter_bulk_items(request):
+        try:
+            if isinstance(raw, bytes):
+                item = VehicleBulkItem.model_validate_json(raw)
+            else:
+                item = VehicleBulkItem.model_validate(raw)
+        except ValidationError as exc:
+            rejected += 1
+            if len(errors) < MAX_BULK_ERRORS:
+                errors.append({"index": index, "errors": json.loads(exc.json(include_url=False))})
+            continue
+        row = item.model_dump()
+        row["createdAt"] = row["updatedAt"] = item.createdAt or now
+        batch.append(row)
+        if len(batch) >= BULK_BATCH_SIZE:
+            await insert_batch(db, batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await insert_batch(db, batch)
+        inserted += len(batch)
+    await db.commit()
+    if inserted:
+        await cache.ainvalidate()
+    return {"inserted": inserted, "rejected": rejected, "errors": errors}
+
 @router.get("/", response_model=List[VehicleResponse])
-def get_vehicles(skip: int = 0, limit: int = 10, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, db: Session = Depends(get_db)):
-    query = db.query(Vehicle)
-    if start_date and end_date:
-        query = query.filter(Vehicle.createdAt.between(start_date, end_date))
-    vehicles = query.offset(skip).limit(limit).all()
+async def get_vehicles(response: Response, skip: int = 0, limit: int = 10, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None, cursor: Optional[str] = None,
+                       db: AsyncSession = Depends(get_db)):
+    # Newest first. Pass the X-Next-Cursor header back as `cursor` to get the next page;
+    # it seeks on the (createdAt, id) index instead of scanning `skip` rows.
+    async def load():
+        query = filter_by_date(select(Vehicle), start_date, end_date)
+        if cursor is not None:
+            query = query.where(tuple_(Vehicle.createdAt, Vehicle.id) < tuple_(*decode_cursor(cursor)))
+        elif skip:
+            query = query.offset(skip)
+        query = query.order_by(Vehicle.createdAt.desc(), Vehicle.id.desc()).limit(limit)
+        vehicles = [VehicleResponse.model_validate(v, from_attributes=True) for v in await db.scalars(query)]
+        next_cursor = encode_cursor(vehicles[-1]) if len(vehicles) == limit else None
+        return vehicles, next_cursor
+
+    vehicles, next_cursor = await cache.get_or_load(("list", skip, limit, start_date, end_date, cursor), load)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return vehicles
 
+async def iter_export(start_date, end_date, export_format, batch_size=1000):
+    # The session lives inside the generator so it stays open while the response streams
+    async with AsyncSessionLocal() as db:
+        query = filter_by_date(select(*(getattr(Vehicle, c) for c in EXPORT_COLUMNS)), start_date, end_date)
+        query = query.order_by(Vehicle.createdAt, Vehicle.id)
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        if export_format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\n"
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            if export_format == "csv":
+                csv.writer(buffer).writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + "\n")
+            yield buffer.getvalue()
+
+@router.get("/export")
+async def export_vehicles(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                          format: Literal["ndjson", "csv"] = "ndjson"):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="vehicles.{format}"'}
+    return StreamingResponse(iter_export(start_date, end_date, format), media_type=media_type, headers=headers)
+
 @router.get("/{vehicle_id}", response_model=VehicleResponse)
-def get_vehicle(vehicle_id: int, db: Session = Depends(get_db)):
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+async def get_vehicle(vehicle_id: int, db: AsyncSession = Depends(get_db)):
+    async def load():
+        vehicle = await db.get(Vehicle, vehicle_id)
+        return None if vehicle is None else VehicleResponse.model_validate(vehicle, from_attributes=True)
+
+    vehicle = await cache.get_or_load(("vehicle", vehicle_id), load)
     if vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     return vehicle
@@ -0,0 +1,120 @@
+"""Offline throughput benchmark for the VideoProcessor configurations.
+
+    python -m app.benchmark --frames 500
+    python -m app.benchmark --video recorded.mp4 --latency 0.03 --variants up_down
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from .replay import NullEventSink, ReplaySource, StubDetector, SyntheticSource
+from .video_processing import UP_DOWN_OPTIONS, VideoProcessor
+
+# Variant name -> VideoProcessor options (a camera without rules, and the cam_truoc / cam_sau / main.py setup)
+VARIANTS = {
+    "app": {},
+    "up_down": UP_DOWN_OPTIONS,
+}
+
+
+def make_source(args):
+    if args.video:
+        return ReplaySource(args.video, rate=args.rate, loop=True, max_fps=args.max_fps if args.grab_skip else None)
+    return SyntheticSource(size=(args.width, args.height), rate=args.rate)
+
+
+def run_variant(name, args, detector=None, **processor_kwargs):
+    """Process args.frames frames with one VideoProcessor configuration and return its timings."""
+    with tempfile.TemporaryDirectory() as cam_path:
+        processor = VideoProcessor(
+            source=make_source(args),
+            model_path=None,
+            cam_path=cam_path,
+            max_fps=args.max_fps,
+            event_sink=NullEventSink(),
+            detector=detector or StubDetector(num_tracks=args.tracks, latency=args.latency),
+            name=name,
+            headless=args.headless,
+            motion_gate=args.motion_gate,
+            target_latency=args.target_latency,
+            min_fps=args.min_fps,
+            queue_size=args.queue_size,
+            **dict(VARIANTS[name], **processor_kwargs),
+        )
+        for _ in range(args.warmup):
+            processor.process_frame()
+        # End-to-end latency of each frame: captured by the source until the last stage is done with it
+        latencies = []
+        started = time.perf_counter()
+        while len(latencies) < args.frames:
+            packet = processor.next_packet()
+            if packet is None:
+                if processor.closed:
+                    break
+                continue
+            latencies.append(packet.done_at - packet.captured_at)
+        elapsed = time.perf_counter() - started
+        snapshots = processor.snapshot_writer.stats()
+        events = processor.event_sink.stats()["written"]
+        capture = processor.get_capture_stats()
+        skipped = processor.metrics.skipped
+        processor.stop()
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        "variant": name,
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "p90_ms": float(np.percentile(latencies, 90)) if len(latencies) else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        "max_ms": float(latencies.max()) if len(latencies) else 0.0,
+        "events": events,
+        "snapshots_written": snapshots["written"],
+        "snapshots_dropped": snapshots["dropped"],
+        "frames_dropped": capture["dropped"],
+        "frames_skipped": skipped,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--frames", type=int, default=300, help="frames to time per variant")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--video", help="local video file; synthetic frames when omitted")
+    parser.add_argument("--width", type=int, default=1920, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=1080, help="synthetic frame height")
+    parser.add_argument("--rate", type=float, help="source frame rate; full speed when omitted")
+    parser.add_argument("--max-fps", type=float, help="processor inference cap; unlimited when omitted")
+    parser.add_argument("--tracks", type=int, default=8, help="simulated cars for the stub detector")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated detector latency in seconds")
+    parser.add_argument("--headless", action="store_true", help="skip annotation except on snapshots")
+    parser.add_argument("--motion-gate", action="store_true", help="skip inference while nothing moves in the zones")
+    parser.add_argument("--target-latency", type=float, help="adapt the inference interval to this detector latency")
+    parser.add_argument("--min-fps", type=float, help="lowest inference rate --target-latency may back off to")
+    parser.add_argument("--grab-skip", action="store_true",
+                        help="with --video and --max-fps, grab() the frames above --max-fps without decoding them")
+    parser.add_argument("--queue-size", type=int, default=1, help="frames queued between pipeline stages")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = [run_variant(name, args) for name in args.variants]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return results
+    print(f"{'variant':<12}{'frames':>8}{'fps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'events':>8}")
+    for r in results:
+        print(f"{r['variant']:<12}{r['frames']:>8}{r['fps']:>9.1f}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['events']:>8}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
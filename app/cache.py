@@ -0,0 +1,159 @@
+import logging
+import multiprocessing as mp
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LocalGeneration:
+    """Invalidation counter shared by this API process and the camera workers it spawns."""
+
+    def __init__(self, ctx=None):
+        self._value = (ctx or mp.get_context("spawn")).Value("L", 0)
+
+    @property
+    def value(self):
+        return self._value.value
+
+    def bump(self):
+        with self._value.get_lock():
+            self._value.value += 1
+
+    async def avalue(self):
+        return self.value
+
+    async def abump(self):
+        self.bump()
+
+
+class RedisGeneration:
+    """Invalidation counter kept in Redis, so every API process and worker sees each bump.
+
+    value and bump() block on Redis and are for worker threads; the API's
+    event loop uses avalue() and abump(), which go through redis.asyncio.
+    The value is None while Redis is unreachable, which turns caching off
+    rather than risking stale reads.
+    """
+
+    def __init__(self, url, key="demxe:vehicles:generation"):
+        self.url = url
+        self.key = key
+        self._client = None
+        self._async_client = None
+
+    def __getstate__(self):
+        # Sent to worker processes; each one opens its own connection
+        return {"url": self.url, "key": self.key, "_client": None, "_async_client": None}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url, socket_timeout=0.1)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import redis.asyncio
+
+            self._async_client = redis.asyncio.Redis.from_url(self.url, socket_timeout=0.1)
+        return self._async_client
+
+    @property
+    def value(self):
+        try:
+            return int(self.client.get(self.key) or 0)
+        except Exception:
+            logger.warning("Cache generation unavailable from %s", self.url, exc_info=True)
+            return None
+
+    def bump(self):
+        try:
+            self.client.incr(self.key)
+        except Exception:
+            logger.warning("Could not invalidate the cache through %s", self.url, exc_info=True)
+
+    async def avalue(self):
+        try:
+            return int(await self.async_client.get(self.key) or 0)
+        except Exception:
+            logger.warning("Cache generation unavailable from %s", self.url, exc_info=True)
+            return None
+
+    async def abump(self):
+        try:
+            await self.async_client.incr(self.key)
+        except Exception:
+            logger.warning("Could not invalidate the cache through %s", self.url, exc_info=True)
+
+
+def make_generation(redis_url=None):
+    return RedisGeneration(redis_url) if redis_url else LocalGeneration()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after ttl seconds.
+
+    invalidate() bumps a generation counter instead of touching every entry;
+    entries stored under an older generation read as misses. The counter may
+    be shared with other processes (see LocalGeneration and RedisGeneration).
+    """
+
+    def __init__(self, maxsize=1024, ttl=2.0, generation=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = generation or LocalGeneration()
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation=MISSING):
+        generation = self.generation.value if generation is MISSING else generation
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, entry_generation, value = entry
+            if generation is not None and entry_generation == generation and time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return MISSING
+
+    def set(self, key, value, generation):
+        """Store value read under generation (read the generation before loading the value)."""
+        if generation is None:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, generation, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key, load):
+        """Return the cached value for key, or await load() and cache its result."""
+        generation = await self.generation.avalue()
+        value = self.get(key, generation)
+        if value is MISSING:
+            value = await load()
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self):
+        self.generation.bump()
+        self._entries.clear()
+
+    async def ainvalidate(self):
+        """invalidate() for the event loop: does not block it on a Redis round trip."""
+        await self.generation.abump()
+        self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+
+
+class FrameRingBuffer:
+    """Bounded frame buffer that always hands out the newest frame.
+
+    When the buffer is full the oldest frame is overwritten, and a reader that
+    takes the newest frame discards everything older than it. Each frame is
+    therefore either consumed or counted as dropped.
+    """
+
+    def __init__(self, capacity=2):
+        self._frames = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._closed = False
+        self.captured = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.last_frame_age = 0.0
+        self._fps = 0.0
+        self._last_put = None
+
+    def put(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._seq += 1
+            self.captured += 1
+            self._frames.append((self._seq, timestamp, frame))
+            # Exponential moving average of the capture rate
+            if self._last_put is not None and timestamp > self._last_put:
+                instant = 1.0 / (timestamp - self._last_put)
+                self._fps = instant if self._fps == 0.0 else 0.9 * self._fps + 0.1 * instant
+            self._last_put = timestamp
+            self._cond.notify_all()
+
+    def get_latest(self, after_seq=0, timeout=None):
+        """Return (seq, timestamp, frame) for the newest frame newer than after_seq.
+
+        Returns None if nothing new arrives within timeout or the buffer is closed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout)
+            if not self._frames or self._frames[-1][0] <= after_seq:
+                return None
+            seq, timestamp, frame = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            self.consumed += 1
+            self.last_frame_age = time.monotonic() - timestamp
+            return seq, timestamp, frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        with self._cond:
+            return {
+                "captured": self.captured,
+                "consumed": self.consumed,
+                "dropped": self.dropped,
+                "frame_age": self.last_frame_age,
+                "capture_fps": self._fps,
+            }
+
+
+class CaptureThread(threading.Thread):
+    """Reads a stream (anything with a CamGear-like read()) into a FrameRingBuffer."""
+
+    def __init__(self, stream, buffer):
+        super().__init__(name="capture", daemon=True)
+        self.stream = stream
+        self.buffer = buffer
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                frame = self.stream.read()
+                if frame is None:
+                    break
+                self.buffer.put(frame, time.monotonic())
+        finally:
+            self.buffer.close()
+
+    def stop(self):
+        # The caller should stop the stream afterwards so a blocked read() returns
+        self._stop_event.set()
+
+
+class FrameSampler:
+    """Limits inference to at most max_fps frames per second (no limit if max_fps is falsy).
+
+    adapt() stretches the interval towards 1 / min_fps while inference is slower
+    than a target latency and shrinks it back once it catches up.
+    """
+
+    def __init__(self, max_fps=None, min_fps=None):
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.max_interval = max(1.0 / min_fps if min_fps else 0.0, self.min_interval)
+        self.interval = self.min_interval
+        self._next = 0.0
+
+    def adapt(self, latency, target):
+        if latency > target:
+            self.interval = min(max(self.interval * 1.25, latency), self.max_interval)
+        else:
+            self.interval = max(self.interval * 0.9, self.min_interval)
+
+    def reset(self):
+        self.interval = self.min_interval
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
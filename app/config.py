@@ -0,0 +1,59 @@
+# app/config.py
+import json
+import os
+import tempfile
+
+from .zone_config import UP_DOWN_RULES
+
+# Model .pt, hoặc model đã export (.onnx, thư mục *_openvino_model) bằng python -m app.export_model
+MODEL_PATH = os.getenv("MODEL_PATH", "yolo11s.pt")
+# Kích thước ảnh đầu vào "cao,rộng" của model đã export (vd. "320,640"); bỏ trống với model .pt
+MODEL_IMGSZ = tuple(int(v) for v in os.environ["MODEL_IMGSZ"].split(",")) if os.getenv("MODEL_IMGSZ") else None
+
+# Bộ giải mã mặc định của camera: "camgear" (giải mã đủ độ phân giải rồi resize) hoặc "ffmpeg"
+# (FFmpeg scale khi giải mã và bỏ khung hình vượt max_fps, cần cài ffmpeg); mỗi camera có thể đặt "decoder"
+DECODER = os.getenv("DECODER", "camgear")
+
+# Thư mục lưu cấu hình khu vực / luật đếm theo phiên bản của từng camera (sửa qua /cameras/{name}/zones)
+ZONES_DIR = os.getenv("ZONES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "zone_configs"))
+
+# Thư mục chứa file lock để mỗi camera chỉ có một worker
+LOCK_DIR = os.getenv("LOCK_DIR", tempfile.gettempdir())
+
+# Cache đọc cho /vehicles: số mục tối đa, thời gian sống (giây), và Redis tùy chọn để
+# các process API dùng chung bộ đếm invalidate (mặc định chỉ trong một process)
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "2"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+# Preview trực tiếp: số khung hình tối đa mỗi giây worker mã hoá JPEG và chất lượng JPEG
+PREVIEW_FPS = float(os.getenv("PREVIEW_FPS", "10"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "80"))
+
+# Cấu hình camera: tên -> tham số cho VideoProcessor, dùng chung cho worker của API và
+# video_processing_cam_*.py để cùng một camera luôn đếm theo cùng luật (rules) và nhãn (labels).
+# Có thể ghi đè bằng file JSON có cùng cấu trúc qua biến môi trường CAMERAS_FILE.
+CAMERAS = {
+    "cam_truoc": {
+        "source": "https://www.youtube.com/watch?v=ByED80IKdIU",
+        "cam_path": "/home/admin-msi/Downloads/demxe/app/images/cam_truoc",
+        "rules": UP_DOWN_RULES,
+        "labels": "class",
+        "max_fps": 10,
+    },
+    "cam_sau": {
+        "source": "https://www.youtube.com/watch?v=_TusTf0iZQU",
+        "cam_path": "/home/admin-msi/Downloads/demxe/app/images/cam_sau",
+        "rules": UP_DOWN_RULES,
+        "labels": "class",
+        "max_fps": 10,
+    },
+}
+
+# Camera khởi động cùng API: "" (mặc định, chờ /process_frame hoặc /cameras/{name}/start),
+# "all", hoặc danh sách tên cách nhau bởi dấu phẩy
+AUTOSTART = os.getenv("AUTOSTART", "")
+
+if os.getenv("CAMERAS_FILE"):
+    with open(os.environ["CAMERAS_FILE"]) as f:
+        CAMERAS = json.load(f)
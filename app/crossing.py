@@ -0,0 +1,155 @@
+import numpy as np
+
+# Zone entries remembered per track for sequence rules
+MAX_VISITS = 8
+
+
+class ZoneSequenceRule:
+    """Counts a track once when it enters the given zones in this order (other zones may come between)."""
+
+    def __init__(self, name, zones):
+        self.name = name
+        self.zones = list(zones)
+
+
+class LineRule:
+    """Counts a track once when its path crosses the line from a to b towards the line's right-hand side.
+
+    In image coordinates (y pointing down) a line drawn left to right counts
+    vehicles moving down; draw it right to left to count vehicles moving up.
+    """
+
+    def __init__(self, name, a, b):
+        self.name = name
+        self.a = np.asarray(a, dtype=np.float64)
+        self.b = np.asarray(b, dtype=np.float64)
+
+
+def rule_from_config(config):
+    """{"name": ..., "zones": [...]} or {"name": ..., "line": [[x1, y1], [x2, y2]]}."""
+    if "line" in config:
+        a, b = config["line"]
+        return LineRule(config["name"], a, b)
+    return ZoneSequenceRule(config["name"], config["zones"])
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+class CrossingEngine:
+    """Turns per-frame track positions into counting events.
+
+    Each track keeps its previous position, so every frame gives a path
+    segment per track. Line rules test those segments against every line at
+    once; zone rules sample points along each segment through the zone label
+    map, so a vehicle that jumps over a thin zone between two processed
+    frames still enters it. A track is counted at most once per rule.
+    """
+
+    def __init__(self, zones, rules, samples=8):
+        self.zones = zones
+        self.rules = list(rules)
+        self.samples = samples
+        lines = [(i, rule) for i, rule in enumerate(self.rules) if isinstance(rule, LineRule)]
+        self.line_rules = [i for i, _ in lines]
+        self.line_a = np.array([rule.a for _, rule in lines]).reshape(-1, 2)
+        self.line_b = np.array([rule.b for _, rule in lines]).reshape(-1, 2)
+        # Last zone of each sequence rule -> rules that may complete on entering it
+        self.sequence_rules = {}
+        for i, rule in enumerate(self.rules):
+            if isinstance(rule, ZoneSequenceRule):
+                indexes = [zones.index(name) for name in rule.zones]
+                self.sequence_rules.setdefault(indexes[-1], []).append((i, indexes))
+        self._steps = np.arange(1, samples + 1) / samples
+
+    def reconfigured(self, zones, rules, tracks):
+        """Return an engine for new zones and rules, keeping the counting state of tracks.
+
+        Zone and rule indexes stored in tracks are renumbered by name; entries
+        for zones or rules that no longer exist are dropped. Raises ValueError,
+        leaving tracks untouched, if a rule names an unknown zone.
+        """
+        engine = CrossingEngine(zones, rules, self.samples)
+        new_zones = {name: i for i, name in enumerate(zones.names)}
+        new_rules = {rule.name: i for i, rule in enumerate(engine.rules)}
+        tracks.remap({i: new_zones[name] for i, name in enumerate(self.zones.names) if name in new_zones},
+                     {i: new_rules[rule.name] for i, rule in enumerate(self.rules) if rule.name in new_rules})
+        return engine
+
+    def update(self, states, points):
+        """Advance the tracks in states (TrackState, one per point) to points.
+
+        Returns a list of (detection index, rule name) for the rules counted this frame.
+        """
+        n = len(states)
+        if n == 0:
+            return []
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        has_prev = np.array([state.position is not None for state in states])
+        prev = np.array([state.position if state.position is not None else (0, 0) for state in states],
+                        dtype=np.float64)
+        prev[~has_prev] = points[~has_prev]
+
+        events = []
+        if self.line_rules:
+            events += self._line_events(states, prev, points, has_prev)
+        if self.sequence_rules:
+            events += self._zone_events(states, prev, points, has_prev)
+        for state, point in zip(states, points.astype(np.int64).tolist()):
+            state.position = tuple(point)
+        return events
+
+    def _line_events(self, states, prev, points, has_prev):
+        # (N, L) orientation tests between every track segment and every line
+        direction = self.line_b - self.line_a
+        side_prev = _cross(direction[None], prev[:, None] - self.line_a[None])
+        side_cur = _cross(direction[None], points[:, None] - self.line_a[None])
+        move = (points - prev)[:, None]
+        end_a = _cross(move, self.line_a[None] - prev[:, None])
+        end_b = _cross(move, self.line_b[None] - prev[:, None])
+        crossed = (side_prev < 0) & (side_cur >= 0) & (end_a * end_b <= 0) & has_prev[:, None]
+        events = []
+        for i, j in zip(*np.nonzero(crossed)):
+            rule = self.line_rules[j]
+            if self._count(states[i], rule):
+                events.append((int(i), self.rules[rule].name))
+        return events
+
+    def _zone_events(self, states, prev, points, has_prev):
+        # Labels at the previous position and at `samples` points along the path, (N, S + 1)
+        steps = np.where(has_prev[:, None], self._steps[None], 1.0)
+        path = prev[:, None] + (points - prev)[:, None] * steps[..., None]
+        labels = np.concatenate((
+            np.where(has_prev, self.zones.labels(prev.round()), 0)[:, None],
+            self.zones.labels(path.round().reshape(-1, 2)).reshape(len(states), -1),
+        ), axis=1)
+        entered = labels[:, 1:] & ~labels[:, :-1]
+        events = []
+        for i in np.flatnonzero(entered.any(axis=1)):
+            state = states[i]
+            for bits in entered[i][entered[i] != 0].tolist():
+                for zone, bit in enumerate(self.zones.bits.tolist()):
+                    if bits & bit:
+                        events += [(int(i), name) for name in self._enter(state, zone)]
+        return events
+
+    def _enter(self, state, zone):
+        state.visits = (state.visits + (zone,))[-MAX_VISITS:]
+        names = []
+        for rule, indexes in self.sequence_rules.get(zone, ()):
+            if _is_subsequence(indexes, state.visits) and self._count(state, rule):
+                names.append(self.rules[rule].name)
+        return names
+
+    @staticmethod
+    def _count(state, rule):
+        if state.counted & (1 << rule):
+            return False
+        state.counted |= 1 << rule
+        return True
+
+
+def _is_subsequence(needle, haystack):
+    it = iter(haystack)
+    return all(item in it for item in needle)
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from .db import engine
+from .models import Vehicle
+from .rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+# Errors that say the database could not be reached, not that it refused the rows; only these are retried
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def _json_default(value):
+    # Dead-lettered rows may hold values that are neither datetimes nor JSON types
+    return value.isoformat() if isinstance(value, datetime) else repr(value)
+
+
+class EventSink:
+    """Buffers crossing events in memory and writes them to the vehicles table in batches.
+
+    add() is a list append; a background thread flushes the buffer with one
+    multi-row INSERT (plus one vehicle_counts upsert) when batch_size events
+    are pending or flush_interval seconds have passed. Failed batches are retried with exponential backoff
+    and, if the database stays unreachable, appended to an NDJSON spill file
+    that is replayed after the next successful flush. Rows the database
+    rejects outright (bad data, constraint violations) would fail forever, so
+    they are isolated by splitting the batch and appended, with the error, to
+    the dead-letter file instead. on_write, if set, is called after every
+    committed batch (e.g. to invalidate API read caches).
+    """
+
+    def __init__(self, camera=None, bind=None, batch_size=500, flush_interval=2.0, max_retries=3,
+                 retry_backoff=0.5, spill_path="pending_events.ndjson", on_write=None, dead_letter_path=None):
+        self.camera = camera
+        self.bind = bind if bind is not None else engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.on_write = on_write
+        self.dead_letter_path = dead_letter_path or os.path.splitext(spill_path)[0] + ".rejected.ndjson"
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self.written = 0
+        self.failed_batches = 0
+        self.spilled = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+        self._thread.start()
+
+    def add(self, track_id, direction, image_path, created_at=None):
+        created_at = created_at or datetime.utcnow()
+        with self._lock:
+            self._buffer.append({
+                "createdAt": created_at,
+                "updatedAt": created_at,
+                "trackId": str(track_id),
+                "direction": direction,
+                "image_path": image_path,
+                "camera": self.camera,
+            })
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # e.g. the spill file cannot be written; keep flushing later events
+                logger.exception("Flushing vehicle events of %s failed", self.camera)
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        with self._flush_lock:
+            if rows:
+                pending = self._write_with_retry(rows)
+                if pending:
+                    self._spill(pending)
+                    return
+            if os.path.exists(self.spill_path):
+                self._replay_spill()
+
+    def _write(self, rows):
+        with self.bind.begin() as conn:
+            conn.execute(insert(Vehicle.__table__), rows)
+            # Count rollups are updated in the same transaction as the events
+            apply_rollups(conn, rows)
+
+    def _write_with_retry(self, rows):
+        """Write rows and return those still to be written: empty unless the database stayed unreachable."""
+        for attempt in range(self.max_retries):
+            try:
+                self._write(rows)
+            except TRANSIENT_ERRORS as exc:
+                logger.warning("Writing %d vehicle events failed (attempt %d): %s", len(rows), attempt + 1, exc)
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as exc:
+                if len(rows) == 1:
+                    self._dead_letter(rows[0], exc)
+                    return []
+                # Split the batch so only the offending rows are set aside
+                half = len(rows) // 2
+                pending = self._write_with_retry(rows[:half])
+                if pending:
+                    return pending + rows[half:]
+                return self._write_with_retry(rows[half:])
+            else:
+                self.written += len(rows)
+                if self.on_write is not None:
+                    self.on_write()
+                return []
+        self.failed_batches += 1
+        return rows
+
+    def _dead_letter(self, row, error):
+        with open(self.dead_letter_path, "a") as f:
+            f.write(json.dumps({"row": row, "error": str(error)}, default=_json_default) + "\n")
+        self.rejected += 1
+        logger.error("Vehicle event rejected by the database, moved to %s: %s", self.dead_letter_path, error)
+
+    def _spill(self, rows):
+        with open(self.spill_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default) + "\n")
+        self.spilled += len(rows)
+        logger.error("Database unreachable, spilled %d vehicle events to %s", len(rows), self.spill_path)
+
+    def _replay_spill(self):
+        rows = []
+        with open(self.spill_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["createdAt"] = datetime.fromisoformat(row["createdAt"])
+                    row["updatedAt"] = datetime.fromisoformat(row["updatedAt"])
+                except (ValueError, TypeError, KeyError) as exc:
+                    # e.g. a line cut short by a crash while spilling
+                    self._dead_letter(line.rstrip("\n"), exc)
+                    continue
+                row.setdefault("camera", None)
+                rows.append(row)
+        for start in range(0, len(rows), self.batch_size):
+            # On failure keep only the rows that were not written yet
+            pending = self._write_with_retry(rows[start:start + self.batch_size])
+            if pending:
+                self._rewrite_spill(pending + rows[start + self.batch_size:])
+                return
+        os.remove(self.spill_path)
+        self.spilled = 0
+        logger.info("Replayed %d spilled vehicle events from %s", len(rows), self.spill_path)
+
+    def _rewrite_spill(self, rows):
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default) + "\n")
+        os.replace(tmp_path, self.spill_path)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def stats(self):
+        return {
+            "buffered": self.pending(),
+            "written": self.written,
+            "failed_batches": self.failed_batches,
+            "spilled": self.spilled,
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,172 @@
+"""Export the YOLO model for CPU inference and check it against the PyTorch model.
+
+Run from the repository root:
+
+    python -m app.export_model --format openvino --int8 --calibrate cam_truoc.mp4 cam_sau.mp4
+    python -m app.export_model --check yolo11s_int8_openvino_model --video cam_truoc.mp4
+
+Then set MODEL_PATH to the exported model and MODEL_IMGSZ to the printed size.
+INT8 calibration uses frames sampled from recordings of our own cameras,
+resized the same way the processors resize them.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from .inference import CAR_CLASSES, load_model
+from .zones import FRAME_SIZE
+
+
+def default_imgsz(long_side=640, stride=32):
+    """(height, width) the PyTorch model letterboxes a processed frame to."""
+    width, height = FRAME_SIZE
+    scale = long_side / max(width, height)
+    return (math.ceil(height * scale / stride) * stride, math.ceil(width * scale / stride) * stride)
+
+
+def sample_frames(videos, count):
+    """Yield about count frames spread evenly over each video, resized to FRAME_SIZE."""
+    for path in videos:
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise IOError(f"Cannot open video file {path}")
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+        for position in np.linspace(0, total - 1, min(count, total)).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+            ok, frame = capture.read()
+            if ok:
+                yield cv2.resize(frame, FRAME_SIZE)
+        capture.release()
+
+
+def write_calibration_set(videos, count, root, names):
+    """Write sampled frames and an ultralytics dataset YAML under root; return the YAML path."""
+    image_dir = os.path.join(root, "images")
+    os.makedirs(image_dir)
+    written = 0
+    for i, frame in enumerate(sample_frames(videos, count)):
+        cv2.imwrite(os.path.join(image_dir, f"{i:06d}.jpg"), frame)
+        written += 1
+    if not written:
+        raise ValueError("No calibration frames could be read")
+    data = os.path.join(root, "calibration.yaml")
+    with open(data, "w") as f:
+        yaml.safe_dump({"path": root, "train": "images", "val": "images", "names": names}, f)
+    return data
+
+
+def export(args):
+    from ultralytics import YOLO
+
+    model = YOLO(args.model)
+    kwargs = {"format": args.format, "imgsz": args.imgsz, "dynamic": args.dynamic, "batch": args.batch}
+    with tempfile.TemporaryDirectory() as root:
+        if args.int8:
+            kwargs["int8"] = True
+            kwargs["data"] = write_calibration_set(args.calibrate, args.calibration_frames, root, model.names)
+        path = model.export(**kwargs)
+    print(f"Exported {path}")
+    print(f"MODEL_PATH={path} MODEL_IMGSZ={args.imgsz[0]},{args.imgsz[1]}")
+    return path
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_boxes(reference, candidate, threshold):
+    """Greedily pair boxes by IoU; return the IoU of every pair at or above threshold."""
+    if len(reference) == 0 or len(candidate) == 0:
+        return []
+    iou = box_iou(reference, candidate)
+    matched = []
+    while iou.size and iou.max() >= threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        matched.append(float(iou[i, j]))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return matched
+
+
+def check(args):
+    """Compare the exported model's detections and latency with the reference model."""
+    models = {name: load_model(path, args.imgsz) for name, path in (("reference", args.model), ("exported", args.check))}
+    counts = {"reference": 0, "exported": 0}
+    seconds = {"reference": 0.0, "exported": 0.0}
+    ious = []
+    frames = 0
+    for frame in sample_frames(args.video, args.frames):
+        boxes = {}
+        for name, model in models.items():
+            started = time.perf_counter()
+            result = model.predict(frame, imgsz=args.imgsz, classes=CAR_CLASSES, verbose=False)[0]
+            seconds[name] += time.perf_counter() - started
+            boxes[name] = result.boxes.xyxy.cpu().numpy()
+            counts[name] += len(boxes[name])
+        ious += match_boxes(boxes["reference"], boxes["exported"], args.iou)
+        frames += 1
+    if not frames:
+        raise ValueError("No frames could be read for the parity check")
+
+    recall = len(ious) / counts["reference"] if counts["reference"] else 1.0
+    precision = len(ious) / counts["exported"] if counts["exported"] else 1.0
+    reference_ms = seconds["reference"] / frames * 1000.0
+    exported_ms = seconds["exported"] / frames * 1000.0
+    print(f"frames {frames}, reference boxes {counts['reference']}, exported boxes {counts['exported']}")
+    print(f"matched recall {recall:.3f}, precision {precision:.3f}, mean IoU {np.mean(ious) if ious else 0.0:.3f}")
+    print(f"latency reference {reference_ms:.1f} ms, exported {exported_ms:.1f} ms "
+          f"({reference_ms / exported_ms if exported_ms else 0.0:.2f}x)")
+    return recall >= args.min_agreement and precision >= args.min_agreement
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="yolo11s.pt", help="PyTorch model to export or compare against")
+    parser.add_argument("--format", default="openvino", choices=["openvino", "onnx"])
+    parser.add_argument("--imgsz", type=int, nargs=2, default=default_imgsz(), metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--int8", action="store_true", help="INT8 quantization (OpenVINO only)")
+    parser.add_argument("--calibrate", nargs="+", default=[], metavar="VIDEO", help="recordings to calibrate INT8 on")
+    parser.add_argument("--calibration-frames", type=int, default=300, help="frames sampled per recording")
+    parser.add_argument("--batch", type=int, default=1, help="fixed batch size; cameras per worker group")
+    parser.add_argument("--dynamic", action="store_true", help="export with a dynamic batch size")
+    parser.add_argument("--check", metavar="EXPORTED", help="compare EXPORTED with --model instead of exporting")
+    parser.add_argument("--video", nargs="+", default=[], help="recordings used by --check")
+    parser.add_argument("--frames", type=int, default=100, help="frames sampled per recording by --check")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU at which two boxes count as the same car")
+    parser.add_argument("--min-agreement", type=float, default=0.9, help="lowest recall/precision --check accepts")
+    args = parser.parse_args(argv)
+    args.imgsz = tuple(args.imgsz)
+    if args.int8 and args.format != "openvino":
+        parser.error("--int8 is only supported with --format openvino")
+    if args.int8 and not args.calibrate:
+        parser.error("--int8 needs --calibrate with at least one recording")
+    if args.check and not args.video:
+        parser.error("--check needs --video")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check:
+        return 0 if check(args) else 1
+    export(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
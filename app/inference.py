@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .zones import FRAME_SIZE
+
+logger = logging.getLogger(__name__)
+
+# COCO class id of "car", the only class the processors count
+CAR_CLASSES = [2]
+
+
+class Detections:
+    """Tracked detections for one frame as NumPy arrays."""
+
+    __slots__ = ("boxes", "class_ids", "track_ids", "confidences")
+
+    def __init__(self, boxes, class_ids, track_ids, confidences):
+        self.boxes = boxes  # (N, 4) int xyxy
+        self.class_ids = class_ids
+        self.track_ids = track_ids
+        self.confidences = confidences
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.int32),
+                   np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+    @classmethod
+    def from_result(cls, result):
+        """Build from an ultralytics Result; untracked results give no detections."""
+        boxes = result.boxes
+        if boxes is None or boxes.id is None:
+            return cls.empty()
+        return cls(boxes.xyxy.int().cpu().numpy(), boxes.cls.int().cpu().numpy(),
+                   boxes.id.int().cpu().numpy(), boxes.conf.cpu().numpy())
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        """Build from tracker output rows [x1, y1, x2, y2, track_id, score, cls, idx]."""
+        if len(tracks) == 0:
+            return cls.empty()
+        return cls(tracks[:, :4].astype(np.int32), tracks[:, 6].astype(np.int32),
+                   tracks[:, 4].astype(np.int32), tracks[:, 5].astype(np.float32))
+
+
+def load_model(model_path, imgsz=None, classes=CAR_CLASSES, warmup_runs=2):
+    """Load a YOLO model (.pt, .onnx or an OpenVINO directory) and run it on blank frames.
+
+    Exported models have a fixed input size, so pass the imgsz they were
+    exported with. Warming up moves session creation and graph compilation
+    out of the first real frame.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    width, height = FRAME_SIZE
+    blank = np.zeros((height, width, 3), dtype=np.uint8)
+    for _ in range(warmup_runs):
+        model.predict(blank, imgsz=imgsz or 640, classes=classes, verbose=False)
+    return model
+
+
+class YoloDetector:
+    """One model and one tracker for a single stream, like model.track(persist=True).
+
+    A .pt model accepts any input size, so track() may be given an imgsz per
+    call; exported models always run at the imgsz they were exported with.
+    """
+
+    def __init__(self, model_path, classes=CAR_CLASSES, imgsz=None):
+        self.model = load_model(model_path, imgsz, classes)
+        self.classes = classes
+        self.imgsz = imgsz or 640
+        self.dynamic_imgsz = str(model_path).endswith(".pt")
+
+    def track(self, frame, imgsz=None):
+        imgsz = imgsz if imgsz is not None and self.dynamic_imgsz else self.imgsz
+        results = self.model.track(frame, persist=True, classes=self.classes, imgsz=imgsz)
+        return Detections.from_result(results[0])
+
+
+def roi_imgsz(rect, scale=1.0, full_imgsz=640, stride=32):
+    """Model input size (height, width) for a region, rounded up to the stride.
+
+    At scale 1.0 the region gets the pixel density of a full-frame pass at
+    full_imgsz (the frame's longest side letterboxed to it); scale > 1
+    upsamples from there.
+    """
+    x1, y1, x2, y2 = rect
+    full = max(full_imgsz) if isinstance(full_imgsz, (tuple, list)) else full_imgsz
+    density = scale * full / max(FRAME_SIZE)
+    return tuple(max(-(-int(round(side * density)) // stride) * stride, stride) for side in (y2 - y1, x2 - x1))
+
+
+class RoiDetector:
+    """Runs a detector on a fixed region of the frame and maps boxes back to frame coordinates.
+
+    The model input is sized to the region at the detector's full-frame pixel
+    density (see roi_imgsz), so a small region means fewer pixels through the
+    model, and scale > 1 gives it a higher effective resolution where it matters. Detectors with a fixed
+    input size (exported models, InferenceServer streams) letterbox the region
+    to that size instead; export with --imgsz equal to roi_imgsz to benefit.
+    The wrapped detector's tracker only ever sees the region, so track IDs
+    behave as with full frames.
+    """
+
+    def __init__(self, detector, rect, scale=1.0):
+        self.detector = detector
+        self.scale = scale
+        self.set_rect(rect)
+
+    def set_rect(self, rect):
+        # One assignment, so a detector running on another thread sees the old or the new region, never a mix
+        x1, y1 = rect[:2]
+        imgsz = roi_imgsz(rect, self.scale, getattr(self.detector, "imgsz", 640))
+        self.region = (rect, np.array([x1, y1, x1, y1], dtype=np.int32), imgsz)
+        logger.info("Detecting in region %s at imgsz %s", rect, self.region[2])
+
+    @property
+    def rect(self):
+        return self.region[0]
+
+    @property
+    def imgsz(self):
+        return self.region[2]
+
+    def track(self, frame):
+        (x1, y1, x2, y2), offset, imgsz = self.region
+        region = frame[y1:y2, x1:x2]
+        if getattr(self.detector, "dynamic_imgsz", False):
+            # Boxes come back in region coordinates whatever size the model ran at
+            detections = self.detector.track(region, imgsz=imgsz)
+        else:
+            detections = self.detector.track(region)
+        if len(detections):
+            detections.boxes = detections.boxes + offset
+        return detections
+
+
+def create_tracker(tracker="botsort.yaml", frame_rate=30):
+    # Same construction ultralytics uses for model.track()
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+
+
+class StreamHandle:
+    """Detector interface for one stream registered with an InferenceServer.
+
+    Each handle keeps its own tracker, so track IDs persist per stream.
+    """
+
+    def __init__(self, server, name, tracker):
+        self.server = server
+        self.name = name
+        self.tracker = tracker
+        self._done = threading.Event()
+        self._result = None
+
+    def track(self, frame, timeout=None):
+        self._done.clear()
+        self.server.submit(self, frame)
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Inference for stream {self.name} timed out")
+        result, self._result = self._result, None
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _set_result(self, result):
+        self._result = result
+        self._done.set()
+
+
+class InferenceServer:
+    """Loads the model once and runs the latest frame of every registered stream as one batch.
+
+    The batch is dispatched when every registered stream has submitted a frame
+    or max_wait seconds after the first submission, whichever comes first.
+    """
+
+    def __init__(self, model_path, classes=CAR_CLASSES, tracker="botsort.yaml", max_wait=0.02, imgsz=None):
+        self.model = load_model(model_path, imgsz, classes)
+        self.classes = classes
+        self.imgsz = imgsz or 640
+        self.tracker_config = tracker
+        self.max_wait = max_wait
+        self.streams = {}
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.frames = 0
+        self._thread = threading.Thread(target=self._run, name="inference-server", daemon=True)
+        self._thread.start()
+
+    def register(self, name):
+        handle = StreamHandle(self, name, create_tracker(self.tracker_config))
+        with self._cond:
+            self.streams[name] = handle
+        return handle
+
+    def unregister(self, name):
+        with self._cond:
+            self.streams.pop(name, None)
+            self._cond.notify_all()
+
+    def submit(self, handle, frame):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("InferenceServer is closed")
+            self._pending[handle.name] = (handle, frame)
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            deadline = time.monotonic() + self.max_wait
+            while not self._closed and len(self._pending) < len(self.streams):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = list(self._pending.values()), {}
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                results = self.model.predict([frame for _, frame in batch], classes=self.classes,
+                                             imgsz=self.imgsz, verbose=False)
+                for (handle, frame), result in zip(batch, results):
+                    handle._set_result(self._track(handle, result, frame))
+            except Exception as exc:
+                logger.exception("Batched inference failed")
+                for handle, _ in batch:
+                    handle._set_result(exc)
+            self.batches += 1
+            self.frames += len(batch)
+
+    @staticmethod
+    def _track(handle, result, frame):
+        det = result.boxes.cpu().numpy()
+        if len(det) == 0:
+            return Detections.empty()
+        return Detections.from_tracks(handle.tracker.update(det, frame))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -1,24 +1,25 @@
 import logging
-from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-
-# Import video processor và các mô hình
-from .video_processing import VideoProcessor
-from .db import SessionLocal  # Đảm bảo có file db.py định nghĩa SessionLocal
-from .models import User, Vehicle  # Đảm bảo có file models.py định nghĩa User và Vehicle
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Import supervisor camera và các mô hình.
+# Không import cv2/ultralytics/torch ở đây (kể cả gián tiếp): chúng chỉ được nạp trong
+# process worker chạy nhận diện, để API khởi động nhanh và không kết nối camera khi import.
+from . import config
+from .supervisor import CameraSupervisor
+from .metrics import render_prometheus
+from .api import camera, stats, vehicle
+from .db import AsyncSessionLocal, async_engine, pool_stats
+from .models import User  # Đảm bảo có file models.py định nghĩa User
 
 # Khởi tạo ứng dụng FastAPI
 app = FastAPI()
-
-# Khởi tạo VideoProcessor
-video_processor = VideoProcessor(
-    source='https://www.youtube.com/watch?v=ByED80IKdIU', 
-    model_path='yolo11s.pt', 
-    cam_path='/home/admin-msi/Downloads/demxe/app/images/cam_truoc'
-)
+app.include_router(camera.router, prefix="/cameras")
+app.include_router(vehicle.router, prefix="/vehicles")
+app.include_router(stats.router, prefix="/stats")
 
 # Cấu hình logging
 logging.basicConfig(level=logging.DEBUG)
@@ -26,21 +27,53 @@ logging.basicConfig(level=logging.DEBUG)
 @app.on_event("startup")
 def startup_event():
     logging.debug("Starting up the app...")
+    # Mỗi camera chạy VideoProcessor trong một process riêng
+    app.state.supervisor = CameraSupervisor(config.CAMERAS, cache_generation=vehicle.cache.generation)
+    # Chỉ khởi động camera khi cấu hình AUTOSTART yêu cầu; mặc định API không chạy nhận diện
+    if config.AUTOSTART == "all":
+        app.state.supervisor.start_all()
+    elif config.AUTOSTART:
+        for name in filter(None, (name.strip() for name in config.AUTOSTART.split(","))):
+            if name in app.state.supervisor.worker_names:
+                app.state.supervisor.start(name)
+            else:
+                logging.warning("AUTOSTART: unknown camera %s", name)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the vehicle counting API"}
 
 @app.get("/process_frame")
-def process_frame(background_tasks: BackgroundTasks):
-    background_tasks.add_task(process_frames)
+def process_frame():
+    # Khởi động worker cho tất cả camera (không khởi động lại nếu đang chạy)
+    app.state.supervisor.start_all()
     return {"status": "processing started"}
 
-def process_frames():
-    while True:
-        frame = video_processor.process_frame()
-        if frame is not None:
-            pass  # Xử lý frame đã được xử lý ở đây
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Số liệu Prometheus: thời gian từng bước, FPS, khung hình bị bỏ, số xe của mỗi camera
+    supervisor = app.state.supervisor
+    lines = ["# TYPE demxe_worker_up gauge", "# TYPE demxe_worker_restarts_total counter"]
+    for name, status in supervisor.status().items():
+        lines.append(f'demxe_worker_up{{worker="{name}"}} {int(status["running"])}')
+        lines.append(f'demxe_worker_restarts_total{{worker="{name}"}} {status["restarts"]}')
+    # Pool kết nối database của process API này (checked_out gần size + max_overflow: pool quá nhỏ)
+    pools = pool_stats()
+    for key, metric, kind in (("size", "demxe_db_pool_size", "gauge"),
+                              ("max_overflow", "demxe_db_pool_max_overflow", "gauge"),
+                              ("checked_out", "demxe_db_pool_checked_out", "gauge"),
+                              ("overflow", "demxe_db_pool_overflow", "gauge"),
+                              ("checkouts", "demxe_db_pool_checkouts_total", "counter")):
+        lines.append(f"# TYPE {metric} {kind}")
+        for pool, pool_values in pools.items():
+            lines.append(f'{metric}{{pool="{pool}"}} {pool_values[key]}')
+    # Cache đọc của /vehicles trong process này
+    cache_stats = vehicle.cache.stats()
+    lines += ["# TYPE demxe_cache_hits_total counter", f"demxe_cache_hits_total {cache_stats['hits']}",
+              "# TYPE demxe_cache_misses_total counter", f"demxe_cache_misses_total {cache_stats['misses']}",
+              "# TYPE demxe_cache_entries gauge", f"demxe_cache_entries {cache_stats['entries']}"]
+    body = render_prometheus(supervisor.metrics_snapshots(), lines)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 # Định nghĩa các mô hình người dùng
 class UserCreate(BaseModel):
@@ -56,93 +89,52 @@ class UserResponse(BaseModel):
     username: str
     password: str
 
-# Định nghĩa các mô hình phương tiện
-class VehicleCreate(BaseModel):
-    trackId: str
-    direction: str
-    image_path: str
-
-class VehicleResponse(BaseModel):
-    id: int
-    createdAt: datetime
-    updatedAt: datetime
-    trackId: str
-    direction: str
-    image_path: str
-
-# Dependency để lấy phiên làm việc với cơ sở dữ liệu
-def get_db():
-    db = SessionLocal()
-    try:
+# Dependency để lấy phiên làm việc (async) với cơ sở dữ liệu
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Endpoint cho người dùng
 @app.post("/users/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = User(username=user.username, password=user.password)  # Lưu mật khẩu trực tiếp
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.put("/users/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.get(User, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     for key, value in user.dict(exclude_unset=True).items():
         setattr(db_user, key, value)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 # API lấy thông tin người dùng theo ID
 @app.get("/users/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == user_id).first()
-    print("db_user:", db_user.__dict__)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    db_user = await db.get(User, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 # API đăng nhập
 @app.post("/login/")
-def login(username: str, password: str, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == username).first()
+async def login(username: str, password: str, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.username == username))
     if db_user and db_user.password == password:  # So sánh mật khẩu trực tiếp
         return {"success": True}
     return {"success": False}
 
-# Endpoint cho phương tiện
-@app.post("/vehicles/", response_model=VehicleResponse)
-def create_vehicle(vehicle: VehicleCreate, db: Session = Depends(get_db)):
-    db_vehicle = Vehicle(**vehicle.dict())
-    db.add(db_vehicle)
-    db.commit()
-    db.refresh(db_vehicle)
-    return db_vehicle
-
-@app.get("/vehicles/", response_model=List[VehicleResponse])
-def get_vehicles(skip: int = 0, limit: int = 10, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, db: Session = Depends(get_db)):
-    query = db.query(Vehicle)
-    if start_date and end_date:
-        query = query.filter(Vehicle.createdAt.between(start_date, end_date))
-    vehicles = query.offset(skip).limit(limit).all()
-    return vehicles
-
-@app.get("/vehicles/{vehicle_id}", response_model=VehicleResponse)
-def get_vehicle(vehicle_id: int, db: Session = Depends(get_db)):
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-    if vehicle is None:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    return vehicle
-
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     logging.debug("Shutting down the app...")
-    video_processor.stream.stop()
+    app.state.supervisor.shutdown()
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
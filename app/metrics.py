@@ -0,0 +1,169 @@
+import bisect
+import threading
+import time
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Snapshot gauge name -> help text. Anything else is exported without help.
+GAUGE_HELP = {
+    "processing_fps": "Frames processed per second",
+    "capture_fps": "Frames read from the stream per second",
+    "frame_age_seconds": "Age of the last frame when inference started on it",
+    "active_tracks": "Tracks currently held in the track store",
+    "snapshot_queue_depth": "Snapshots waiting to be written",
+    "snapshot_write_latency_seconds": "Average snapshot queue and write latency",
+    "event_buffer": "Crossing events waiting to be flushed to the database",
+    "inference_interval_seconds": "Current minimum time between two inference runs",
+}
+COUNTER_HELP = {
+    "frames_processed_total": "Frames run through the detector",
+    "frames_dropped_total": "Captured frames never processed",
+    "frames_skipped_total": "Frames not run through the detector because nothing moved in the zones",
+    "tracks_evicted_total": "Tracks evicted from the track store",
+    "snapshots_dropped_total": "Snapshots dropped because the writer queue was full",
+    "vehicles_without_snapshot_total": "Counted vehicles recorded without an image because their snapshot was dropped",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class ProcessorMetrics:
+    """Per-camera stage timings and counters, cheap enough to update every frame.
+
+    snapshot() returns a plain dict that can be sent to another process and
+    rendered by render_prometheus(). Stages observe from their own threads
+    while snapshot() runs on the publisher's, so adding a stage histogram
+    and listing them share a lock; the per-frame path does not take it.
+    """
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.stages = {}
+        self._stages_lock = threading.Lock()
+        self.vehicles = {}
+        self.frames = 0
+        self.skipped = 0
+        self.missing_snapshots = 0
+        self.frame_age = 0.0
+        self.fps = 0.0
+        self._last_frame = None
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._stages_lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def lap(self, stage, start):
+        """Record the time since start for stage and return the current time for the next lap."""
+        now = time.perf_counter()
+        self.observe(stage, now - start)
+        return now
+
+    def frame_done(self):
+        now = time.perf_counter()
+        if self._last_frame is not None and now > self._last_frame:
+            instant = 1.0 / (now - self._last_frame)
+            self.fps = instant if self.fps == 0.0 else 0.9 * self.fps + 0.1 * instant
+        self._last_frame = now
+        self.frames += 1
+
+    def frame_skipped(self):
+        self.skipped += 1
+
+    def frame_started(self, captured_at):
+        """Record the age of a frame (captured at captured_at, time.monotonic()) as inference starts."""
+        self.frame_age = time.monotonic() - captured_at
+
+    def snapshot_missing(self):
+        self.missing_snapshots += 1
+
+    def count_vehicle(self, direction):
+        self.vehicles[direction] = self.vehicles.get(direction, 0) + 1
+
+    def collect(self, capture, tracks, snapshots, events, interval=0.0):
+        """Snapshot including the stats() dicts of a processor's buffer, track store, writer and sink.
+
+        interval is the processor's current FrameSampler interval.
+        """
+        return self.snapshot(
+            gauges={
+                "capture_fps": capture["capture_fps"],
+                "frame_age_seconds": self.frame_age,
+                "active_tracks": tracks["active"],
+                "snapshot_queue_depth": snapshots["queue_depth"],
+                "snapshot_write_latency_seconds": snapshots["write_latency_avg"],
+                "event_buffer": events["buffered"],
+                "inference_interval_seconds": interval,
+            },
+            counters={
+                "frames_dropped_total": capture["dropped"],
+                "tracks_evicted_total": tracks["evicted"],
+                "snapshots_dropped_total": snapshots["dropped"],
+            },
+        )
+
+    def snapshot(self, gauges=None, counters=None):
+        with self._stages_lock:
+            stages = list(self.stages.items())
+        return {
+            "camera": self.camera,
+            "stages": {name: (list(h.counts), h.sum, h.count) for name, h in stages},
+            "vehicles": dict(self.vehicles),
+            "gauges": dict(gauges or {}, processing_fps=self.fps),
+            "counters": dict(counters or {}, frames_processed_total=self.frames, frames_skipped_total=self.skipped,
+                             vehicles_without_snapshot_total=self.missing_snapshots),
+        }
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def render_prometheus(snapshots, extra_lines=()):
+    """Render processor snapshots in the Prometheus text exposition format."""
+    lines = ["# HELP demxe_stage_seconds Time spent in each process_frame stage",
+             "# TYPE demxe_stage_seconds histogram"]
+    for snap in snapshots:
+        for stage, (counts, total, count) in sorted(snap["stages"].items()):
+            labels = _labels(camera=snap["camera"], stage=stage)
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'demxe_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'demxe_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"demxe_stage_seconds_sum{{{labels}}} {total}")
+            lines.append(f"demxe_stage_seconds_count{{{labels}}} {count}")
+
+    lines += ["# HELP demxe_vehicles_total Vehicles counted per direction",
+              "# TYPE demxe_vehicles_total counter"]
+    for snap in snapshots:
+        for direction, value in sorted(snap["vehicles"].items()):
+            lines.append(f"demxe_vehicles_total{{{_labels(camera=snap['camera'], direction=direction)}}} {value}")
+
+    for kind, key, helps in (("gauge", "gauges", GAUGE_HELP), ("counter", "counters", COUNTER_HELP)):
+        names = sorted({name for snap in snapshots for name in snap[key]})
+        for name in names:
+            if name in helps:
+                lines.append(f"# HELP demxe_{name} {helps[name]}")
+            lines.append(f"# TYPE demxe_{name} {kind}")
+            for snap in snapshots:
+                if name in snap[key]:
+                    lines.append(f"demxe_{name}{{{_labels(camera=snap['camera'])}}} {snap[key][name]}")
+
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
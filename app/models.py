@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from .db import Base
 from datetime import datetime
 from sqlalchemy.ext.declarative import declarative_base
@@ -15,6 +15,10 @@ class User(Base):
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        # Keyset pagination và export theo (createdAt, id)
+        Index("ix_vehicles_createdAt_id", "createdAt", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     createdAt = Column(DateTime, default=datetime.utcnow)
@@ -22,3 +26,14 @@ class Vehicle(Base):
     trackId = Column(String, index=True)
     direction = Column(String)
     image_path = Column(String)
+    camera = Column(String, nullable=True)
+
+class VehicleCount(Base):
+    # Số xe theo camera, hướng và khung thời gian (minute/hour/day), cập nhật dần khi ghi sự kiện
+    __tablename__ = "vehicle_counts"
+
+    bucket = Column(String, primary_key=True)
+    camera = Column(String, primary_key=True)
+    direction = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
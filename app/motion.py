@@ -0,0 +1,37 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap check for movement inside the zones, used to skip inference on an idle road.
+
+    Frames are shrunk by scale and converted to grayscale; a frame counts as
+    moving when at least min_fraction of the masked pixels changed by more
+    than threshold since the previous check. It also reports movement every
+    max_idle seconds, so a slow or stopped vehicle is re-checked by the detector.
+    """
+
+    def __init__(self, mask, scale=0.25, threshold=25, min_fraction=0.002, max_idle=2.0):
+        height, width = mask.shape
+        self.size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        self.mask = cv2.resize(mask.astype(np.uint8), self.size, interpolation=cv2.INTER_NEAREST).astype(bool)
+        self.min_pixels = max(int(np.count_nonzero(self.mask) * min_fraction), 1)
+        self.threshold = threshold
+        self.max_idle = max_idle
+        self._previous = None
+        self._last_motion = 0.0
+
+    def moving(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        small = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        previous, self._previous = self._previous, small
+        if previous is None or now - self._last_motion >= self.max_idle:
+            self._last_motion = now
+            return True
+        changed = np.count_nonzero(cv2.absdiff(small, previous)[self.mask] > self.threshold)
+        if changed >= self.min_pixels:
+            self._last_motion = now
+            return True
+        return False
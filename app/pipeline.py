@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Returned by a stage to end the pipeline once the items already queued have passed through
+STOP = object()
+
+
+class Stage:
+    """One step of a Pipeline.
+
+    process(item) runs on the stage's own thread and returns the item for the
+    next stage, None to drop it, or STOP to end the pipeline. The first stage
+    is the source: it is called with None until it returns STOP.
+    """
+
+    name = "stage"
+
+    def process(self, item):
+        return item
+
+    def close(self):
+        """Called on the stage's thread after its last item."""
+
+
+class Pipeline:
+    """Runs stages on their own threads, connected by bounded queues.
+
+    Stages overlap: while one frame is in the detector, the previous one is
+    being counted and drawn, so the frame rate is set by the slowest stage
+    rather than the sum of all of them. Each queue holds at most queue_size
+    items and a full queue blocks the stage feeding it, so a slow stage never
+    builds up a backlog of stale frames.
+    Items leaving the last stage are returned by get().
+    """
+
+    def __init__(self, stages, queue_size=1, name="pipeline", poll_interval=0.1):
+        self.stages = list(stages)
+        self.name = name
+        self.poll_interval = poll_interval
+        # queues[i] holds the output of stages[i]
+        self.queues = [queue.Queue(queue_size) for _ in self.stages]
+        self.error = None
+        self.closed = False
+        self._stopping = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"{name}-{stage.name}", daemon=True)
+            for i, stage in enumerate(self.stages)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _put(self, index, item):
+        while True:
+            try:
+                self.queues[index].put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                if self._stopping.is_set():
+                    return False
+
+    def _take(self, index):
+        if index == 0:
+            return STOP if self._stopping.is_set() else None
+        while True:
+            try:
+                return self.queues[index - 1].get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return STOP
+
+    def _run(self, index):
+        stage = self.stages[index]
+        try:
+            while True:
+                item = self._take(index)
+                if item is STOP:
+                    break
+                item = stage.process(item)
+                if item is STOP:
+                    break
+                if item is not None and not self._put(index, item):
+                    break
+        except Exception as exc:
+            logger.exception("Stage %s of %s failed", stage.name, self.name)
+            self.error = exc
+            self._stopping.set()
+        finally:
+            try:
+                stage.close()
+            except Exception:
+                logger.exception("Closing stage %s of %s failed", stage.name, self.name)
+            self._put(index, STOP)
+
+    def get(self, timeout=None):
+        """Return the next item from the last stage, or None on timeout or once the pipeline has ended.
+
+        Re-raises the exception of a stage that failed.
+        """
+        if self.closed:
+            return None
+        try:
+            item = self.queues[-1].get(timeout=timeout)
+        except queue.Empty:
+            # A failed stage may not have managed to queue STOP
+            item = STOP if not any(thread.is_alive() for thread in self._threads) else None
+        if item is STOP:
+            self.closed = True
+            if self.error is not None:
+                raise self.error
+            return None
+        return item
+
+    def stop(self, timeout=2.0):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.closed = True
+
+    def stats(self):
+        return {stage.name: self.queues[i].qsize() for i, stage in enumerate(self.stages)}
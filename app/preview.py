@@ -0,0 +1,122 @@
+import asyncio
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PreviewPublisher:
+    """Worker-side preview output for one camera, attached as VideoProcessor.preview.
+
+    Frames are only wanted while somebody is watching and at most max_fps times
+    per second. publish() just parks the frame in a one-slot mailbox; a separate
+    thread JPEG-encodes it once and ships the bytes to the API process. If the
+    encoder or the queue is busy the frame is dropped, so the inference loop
+    never waits on viewers.
+    """
+
+    def __init__(self, camera, out_queue, viewers, max_fps=10, jpeg_quality=80):
+        self.camera = camera
+        self.out_queue = out_queue
+        self.viewers = viewers
+        self.interval = 1.0 / max_fps
+        self.jpeg_quality = jpeg_quality
+        self.seq = 0
+        self.dropped = 0
+        self._next = 0.0
+        self._slot = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"preview-{camera}", daemon=True)
+        self._thread.start()
+
+    def wants_frame(self):
+        return self.viewers.value > 0 and self._slot is None and time.monotonic() >= self._next
+
+    def publish(self, frame):
+        with self._cond:
+            self._slot = frame
+            self._next = time.monotonic() + self.interval
+            self._cond.notify()
+
+    def _run(self):
+        import cv2
+
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._slot is not None or self._closed)
+                if self._closed:
+                    return
+                frame = self._slot
+            ok, jpeg = cv2.imencode(".jpg", frame, params)
+            with self._cond:
+                self._slot = None
+            if not ok:
+                continue
+            self.seq += 1
+            try:
+                self.out_queue.put_nowait((self.camera, self.seq, jpeg.tobytes()))
+            except queue.Full:
+                self.dropped += 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+class PreviewHub:
+    """API-side fan-out: keeps the latest encoded frame per camera for every client.
+
+    Clients read the latest frame at their own rate; nothing is buffered per
+    client, so a slow client simply skips frames.
+    """
+
+    def __init__(self, ctx, cameras):
+        self.queue = ctx.Queue(maxsize=len(cameras) * 2 or 1)
+        self.viewers = {camera: ctx.Value("i", 0) for camera in cameras}
+        self._latest = {camera: (0, None) for camera in cameras}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="preview-hub", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                camera, seq, jpeg = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._latest[camera] = (seq, jpeg)
+
+    def latest(self, camera):
+        return self._latest[camera]
+
+    @contextmanager
+    def viewer(self, camera):
+        with self.viewers[camera].get_lock():
+            self.viewers[camera].value += 1
+        try:
+            yield
+        finally:
+            with self.viewers[camera].get_lock():
+                self.viewers[camera].value -= 1
+            if self.viewers[camera].value == 0:
+                self._latest[camera] = (0, None)
+
+    async def frames(self, camera, fps):
+        """Yield each new JPEG for camera, at most fps times per second."""
+        interval = 1.0 / fps
+        last_seq = 0
+        with self.viewer(camera):
+            while not self._closed:
+                seq, jpeg = self._latest[camera]
+                if jpeg is not None and seq != last_seq:
+                    last_seq = seq
+                    yield jpeg
+                await asyncio.sleep(interval)
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
@@ -0,0 +1,128 @@
+import time
+
+import cv2
+import numpy as np
+
+from .inference import Detections
+from .zones import FRAME_SIZE
+
+
+class ReplaySource:
+    """CamGear-like source that plays a local video file.
+
+    rate=None reads as fast as possible; otherwise frames are paced at rate fps.
+    read() returns None at the end of the file unless loop is set. With
+    max_fps below the file's frame rate, read() only grab()s the frames in
+    between, skipping their colour conversion and copy.
+    """
+
+    def __init__(self, path, rate=None, loop=False, max_fps=None):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open video file {path}")
+        source_fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.stride = max(int(round(source_fps / max_fps)), 1) if max_fps and source_fps else 1
+        self.interval = self.stride / rate if rate else 0.0
+        self.loop = loop
+        self._next = 0.0
+
+    def start(self):
+        return self
+
+    def _pace(self):
+        if self.interval:
+            now = time.monotonic()
+            if now < self._next:
+                time.sleep(self._next - now)
+            self._next = max(self._next, now) + self.interval
+
+    def read(self):
+        self._pace()
+        for _ in range(self.stride - 1):
+            if not self.capture.grab():
+                break
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def stop(self):
+        self.capture.release()
+
+
+class SyntheticSource(ReplaySource):
+    """Endless (or count-limited) noise frames, cycled from a small pre-generated pool."""
+
+    def __init__(self, size=(1920, 1080), count=None, rate=None, pool=8, seed=0):
+        rng = np.random.default_rng(seed)
+        width, height = size
+        self.frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(pool)]
+        self.count = count
+        self.read_count = 0
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+
+    def read(self):
+        if self.count is not None and self.read_count >= self.count:
+            return None
+        self._pace()
+        frame = self.frames[self.read_count % len(self.frames)]
+        self.read_count += 1
+        return frame
+
+    def stop(self):
+        pass
+
+
+class StubDetector:
+    """Detector stand-in that needs no model weights.
+
+    Simulates num_tracks cars driving up and down through the default zones.
+    A car that leaves the frame comes back with a new track ID, so crossings
+    keep happening. latency (seconds) emulates the model's forward pass.
+    """
+
+    def __init__(self, num_tracks=8, frame_size=FRAME_SIZE, box_size=(60, 40), latency=0.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width, self.height = frame_size
+        self.box_w, self.box_h = box_size
+        self.latency = latency
+        self.x = rng.integers(320, 560, num_tracks)
+        self.y = rng.uniform(0, self.height, num_tracks)
+        self.speed = rng.uniform(4, 12, num_tracks) * rng.choice([-1, 1], num_tracks)
+        self.ids = np.arange(1, num_tracks + 1)
+        self.next_id = num_tracks + 1
+
+    def track(self, frame):
+        if self.latency:
+            time.sleep(self.latency)
+        self.y += self.speed
+        out = (self.y < 0) | (self.y > self.height)
+        for i in np.flatnonzero(out):
+            self.y[i] = self.height if self.speed[i] < 0 else 0
+            self.ids[i] = self.next_id
+            self.next_id += 1
+        cx, cy = self.x, self.y.astype(np.int64)
+        boxes = np.stack((cx - self.box_w // 2, cy - self.box_h // 2,
+                          cx + self.box_w // 2, cy + self.box_h // 2), axis=1).astype(np.int32)
+        n = len(self.ids)
+        return Detections(boxes, np.full(n, 2, dtype=np.int32), self.ids.astype(np.int32).copy(),
+                          np.ones(n, dtype=np.float32))
+
+
+class NullEventSink:
+    """EventSink stand-in that only counts events, for runs without a database."""
+
+    def __init__(self):
+        self.events = 0
+
+    def add(self, track_id, direction, image_path, created_at=None):
+        self.events += 1
+
+    def stats(self):
+        return {"buffered": 0, "written": self.events, "failed_batches": 0, "spilled": 0, "rejected": 0}
+
+    def close(self):
+        pass
@@ -0,0 +1,60 @@
+from collections import Counter
+
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import VehicleCount
+
+BUCKETS = ("minute", "hour", "day")
+
+# Camera name stored for vehicles that do not carry one (e.g. posted through the API)
+UNKNOWN_CAMERA = "unknown"
+
+
+def bucket_start(timestamp, bucket):
+    if bucket == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def count_events(rows):
+    """Aggregate vehicle rows (dicts with createdAt, direction, camera) per rollup key."""
+    counts = Counter()
+    for row in rows:
+        camera = row.get("camera") or UNKNOWN_CAMERA
+        for bucket in BUCKETS:
+            counts[(bucket, camera, row["direction"], bucket_start(row["createdAt"], bucket))] += 1
+    return counts
+
+
+def rollup_statement(rows):
+    """One upsert adding rows to the vehicle_counts rollup, or None when there is nothing to add."""
+    counts = count_events(rows)
+    if not counts:
+        return None
+    table = VehicleCount.__table__
+    stmt = insert(table).values([
+        {"bucket": bucket, "camera": camera, "direction": direction, "bucket_start": start, "count": count}
+        for (bucket, camera, direction, start), count in counts.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.bucket, table.c.camera, table.c.direction, table.c.bucket_start],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+
+
+def apply_rollups(conn, rows):
+    """Add rows to the vehicle_counts rollup with one upsert; run it in the insert's transaction."""
+    stmt = rollup_statement(rows)
+    if stmt is not None:
+        conn.execute(stmt)
+
+
+async def apply_rollups_async(session, rows):
+    """apply_rollups() for an AsyncSession or AsyncConnection."""
+    stmt = rollup_statement(rows)
+    if stmt is not None:
+        await session.execute(stmt)
@@ -0,0 +1,146 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotWriter:
+    """Encodes and writes snapshots on a pool of background threads.
+
+    submit() only copies (or crops) the frame and enqueues it, so the caller
+    never touches the filesystem. When the queue is full the overflow policy
+    decides what happens:
+
+    - "block": wait for a free slot
+    - "drop": discard the snapshot
+    - "degrade": once the queue is half full, snapshots are written at
+      degrade_scale of their size; when it is full they are dropped
+
+    on_written(path, size), if set, is called on the writer thread after each
+    snapshot is written (e.g. SnapshotStore.record).
+    """
+
+    POLICIES = ("block", "drop", "degrade")
+
+    def __init__(self, workers=2, max_queue=64, policy="degrade", jpeg_quality=90,
+                 crop=False, crop_margin=20, degrade_scale=0.5, on_written=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.policy = policy
+        self.jpeg_quality = jpeg_quality
+        self.crop = crop
+        self.crop_margin = crop_margin
+        self.degrade_scale = degrade_scale
+        self.on_written = on_written
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.degraded = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"snapshot-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, frame, path, box=None, annotate=None):
+        """Queue a snapshot of frame to be written to path.
+
+        In crop mode only box (x1, y1, x2, y2) plus crop_margin is kept.
+        annotate(image, offset) is called on the writer thread before encoding,
+        where offset is the (x, y) of the image's top-left corner in frame
+        coordinates. Returns False if the snapshot was dropped.
+        """
+        if self.crop and box is not None:
+            image, offset = self._crop(frame, box)
+        else:
+            image, offset = frame.copy(), (0, 0)
+        scale = None
+        if self.policy == "block":
+            self._queue.put((path, image, offset, annotate, scale, time.monotonic()))
+            return True
+        if self.policy == "degrade" and self._queue.qsize() >= self._queue.maxsize // 2:
+            scale = self.degrade_scale
+        try:
+            self._queue.put_nowait((path, image, offset, annotate, scale, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        if scale is not None:
+            with self._lock:
+                self.degraded += 1
+        return True
+
+    def _crop(self, frame, box):
+        x1, y1, x2, y2 = box
+        height, width = frame.shape[:2]
+        x1, y1 = max(x1 - self.crop_margin, 0), max(y1 - self.crop_margin, 0)
+        x2, y2 = min(x2 + self.crop_margin, width), min(y2 + self.crop_margin, height)
+        return frame[y1:y2, x1:x2].copy(), (x1, y1)
+
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            path, image, offset, annotate, scale, queued_at = item
+            try:
+                if annotate is not None:
+                    annotate(image, offset)
+                if scale is not None:
+                    image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if not cv2.imwrite(path, image, params):
+                    raise OSError(f"cv2.imwrite failed for {path}")
+                if self.on_written is not None:
+                    self.on_written(path, os.path.getsize(path))
+            except Exception:
+                logger.exception("Failed to write snapshot %s", path)
+                with self._lock:
+                    self.errors += 1
+            else:
+                # Latency covers the time spent queued plus encoding and writing
+                latency = time.monotonic() - queued_at
+                with self._lock:
+                    self.written += 1
+                    self.last_latency = latency
+                    self.max_latency = max(self.max_latency, latency)
+                    self._total_latency += latency
+            finally:
+                self._queue.task_done()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "degraded": self.degraded,
+                "errors": self.errors,
+                "write_latency_last": self.last_latency,
+                "write_latency_max": self.max_latency,
+                "write_latency_avg": self._total_latency / self.written if self.written else 0.0,
+            }
+
+    def close(self, timeout=5.0):
+        """Flush pending snapshots and stop the worker threads."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,126 @@
+import itertools
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.sqlite3"
+
+
+class SnapshotStore:
+    """Date/hour-sharded snapshot layout for one camera, with an index and retention.
+
+    Snapshots go to root/YYYY-MM-DD/HH/vehicle_<event_id>.jpg, where root is
+    the camera's directory and event_id is unique even when a track crosses
+    twice in the same second. A SQLite index in root maps event IDs to paths
+    and sizes. Retention deletes whole hour directories, either when they are
+    older than retention_days or, oldest first, while the total size exceeds
+    max_bytes. The hour being written is never deleted.
+    """
+
+    def __init__(self, root, retention_days=None, max_bytes=None, retention_interval=600.0):
+        self.root = root
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, INDEX_NAME), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "event_id TEXT PRIMARY KEY, path TEXT NOT NULL, hour TEXT NOT NULL,"
+            " created_at REAL NOT NULL, size INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_snapshots_hour ON snapshots (hour)")
+        self._db.commit()
+        self.deleted = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        if retention_days is not None or max_bytes is not None:
+            self._thread = threading.Thread(target=self._run, args=(retention_interval,),
+                                            name="snapshot-retention", daemon=True)
+            self._thread.start()
+
+    def path_for(self, track_id, now=None):
+        """Return a new, unique snapshot path for track_id under the current date and hour."""
+        now = now or datetime.now()
+        event_id = f"{now:%Y%m%d%H%M%S%f}_{track_id}_{next(self._seq)}"
+        return os.path.join(self.root, f"{now:%Y-%m-%d}", f"{now:%H}", f"vehicle_{event_id}.jpg")
+
+    def record(self, path, size):
+        """Index a written snapshot; SnapshotWriter calls this from its writer threads."""
+        hour_dir = os.path.dirname(path)
+        hour = os.path.relpath(hour_dir, self.root)
+        event_id = os.path.splitext(os.path.basename(path))[0].removeprefix("vehicle_")
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                             (event_id, path, hour, time.time(), size))
+            self._db.commit()
+
+    def lookup(self, event_id):
+        with self._lock:
+            row = self._db.execute("SELECT path FROM snapshots WHERE event_id = ?", (event_id,)).fetchone()
+        return row[0] if row else None
+
+    def _hours(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT hour, SUM(size) FROM snapshots GROUP BY hour ORDER BY hour").fetchall()
+
+    def _delete_hour(self, hour):
+        shutil.rmtree(os.path.join(self.root, hour), ignore_errors=True)
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM snapshots WHERE hour = ?", (hour,)).rowcount
+            self._db.commit()
+        self.deleted += deleted
+        day_dir = os.path.dirname(os.path.join(self.root, hour))
+        if os.path.isdir(day_dir) and not os.listdir(day_dir):
+            os.rmdir(day_dir)
+
+    def enforce_retention(self, now=None):
+        """Delete expired hour directories; return how many hours were removed."""
+        now = now or datetime.now()
+        current = f"{now:%Y-%m-%d}{os.sep}{now:%H}"
+        all_hours = self._hours()
+        total = sum(size for _, size in all_hours)
+        hours = [(hour, size) for hour, size in all_hours if hour < current]
+        cutoff = None
+        if self.retention_days is not None:
+            cutoff = f"{now - timedelta(days=self.retention_days):%Y-%m-%d}{os.sep}{now:%H}"
+        removed = 0
+        for hour, size in hours:
+            expired = cutoff is not None and hour < cutoff
+            oversized = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or oversized):
+                break
+            self._delete_hour(hour)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Removed %d hours of snapshots from %s", removed, self.root)
+        return removed
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.enforce_retention()
+            except Exception:
+                logger.exception("Snapshot retention failed for %s", self.root)
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        return {"snapshots": count, "bytes": size, "deleted": self.deleted}
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,284 @@
+import fcntl
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+
+from . import config
+from .preview import PreviewHub, PreviewPublisher
+
+logger = logging.getLogger(__name__)
+
+# Exit code used by a worker that finds another process already running its camera
+EXIT_ALREADY_RUNNING = 3
+
+
+def _lock_camera(name):
+    # The lock is held for the life of the process, so a camera can only have
+    # one worker even across several API processes on the same host.
+    lock_file = open(os.path.join(config.LOCK_DIR, f"demxe-{name}.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.error("Camera %s is already running in another process", name)
+        sys.exit(EXIT_ALREADY_RUNNING)
+    return lock_file
+
+
+def _run_processor(processor, stop_event, done):
+    try:
+        while not stop_event.is_set() and not done.is_set() and not processor.closed:
+            processor.process_frame()
+    except Exception:
+        logger.exception("Camera processor crashed")
+    finally:
+        done.set()
+        processor.stop()
+
+
+def _publish_metrics(processors, metrics_queue, done, interval):
+    while not done.wait(interval):
+        for processor in processors:
+            try:
+                metrics_queue.put_nowait(processor.metrics_snapshot())
+            except queue.Full:
+                pass
+            except Exception:
+                # A bad snapshot must not end publishing for the rest of the worker's life
+                logger.exception("Publishing metrics of %s failed", processor.name)
+
+
+def run_worker(name, cameras, stop_event, metrics_queue=None, metrics_interval=2.0,
+               preview_queue=None, viewers=None, cache_generation=None):
+    """Worker process entry point: run the given cameras until stop_event is set.
+
+    A worker with several cameras loads the model once and batches their
+    frames through a shared InferenceServer; each camera keeps its own tracker.
+    Preview frames are encoded only while viewers[camera] is non-zero, and
+    cache_generation is bumped after each batch of vehicle events is written.
+    """
+    logging.basicConfig(level=logging.INFO)
+    locks = [_lock_camera(camera_name) for camera_name in cameras]
+
+    # Heavy imports (OpenCV, YOLO) only happen inside the worker process
+    from .video_processing import VideoProcessor
+
+    server = None
+    if len(cameras) > 1:
+        from .inference import InferenceServer
+        server = InferenceServer(config.MODEL_PATH, imgsz=config.MODEL_IMGSZ)
+
+    processors = []
+    for camera_name, camera_config in cameras.items():
+        kwargs = dict(camera_config)
+        kwargs.pop("group", None)
+        kwargs.setdefault("model_path", config.MODEL_PATH)
+        kwargs.setdefault("model_imgsz", config.MODEL_IMGSZ)
+        kwargs.setdefault("zones_dir", config.ZONES_DIR)
+        kwargs.setdefault("decoder", config.DECODER)
+        kwargs.setdefault("name", camera_name)
+        # Nobody looks at frames in the API workers; annotate only snapshots and previews
+        kwargs.setdefault("headless", True)
+        if server is not None:
+            kwargs["detector"] = server.register(camera_name)
+        processors.append(VideoProcessor(**kwargs))
+        if cache_generation is not None:
+            processors[-1].event_sink.on_write = cache_generation.bump
+
+    publishers = []
+    if preview_queue is not None:
+        for camera_name, processor in zip(cameras, processors):
+            processor.preview = PreviewPublisher(camera_name, preview_queue, viewers[camera_name],
+                                                 config.PREVIEW_FPS, config.PREVIEW_JPEG_QUALITY)
+            publishers.append(processor.preview)
+
+    # Any camera stopping brings the whole worker down so it is restarted as a unit
+    done = threading.Event()
+    threads = [
+        threading.Thread(target=_run_processor, args=(processor, stop_event, done), name=f"camera-{camera_name}")
+        for camera_name, processor in zip(cameras, processors)
+    ]
+    if metrics_queue is not None:
+        threads.append(threading.Thread(target=_publish_metrics, name="metrics",
+                                        args=(processors, metrics_queue, done, metrics_interval)))
+    for thread in threads:
+        thread.start()
+    while not stop_event.is_set() and not done.is_set():
+        done.wait(0.5)
+    done.set()
+    for thread in threads:
+        thread.join()
+    if server is not None:
+        server.close()
+    for publisher in publishers:
+        publisher.close()
+    for lock_file in locks:
+        lock_file.close()
+    if not stop_event.is_set():
+        # A stream ended on its own; exit non-zero so the supervisor restarts us
+        logger.warning("Worker %s stopped unexpectedly", name)
+        sys.exit(1)
+
+
+class CameraWorker:
+    def __init__(self, name, cameras):
+        self.name = name
+        self.cameras = cameras
+        self.process = None
+        self.stop_event = None
+        self.desired = False
+        self.restarts = 0
+        self.started_at = None
+        self.next_start = 0.0
+        self.backoff = 0.0
+        self.last_exitcode = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class CameraSupervisor:
+    """Runs each configured camera in its own OS process.
+
+    Cameras that set the same "group" share one worker process and one
+    batched model. A monitor thread restarts crashed workers with exponential
+    backoff (reset once a worker has stayed up for stable_after seconds).
+    """
+
+    def __init__(self, cameras, min_backoff=1.0, max_backoff=60.0, stable_after=60.0, poll_interval=1.0,
+                 cache_generation=None):
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        # Workers push metric snapshots here; the monitor thread keeps the latest per camera
+        self.metrics_queue = self._ctx.Queue(maxsize=1000)
+        self.metrics = {}
+        # Workers bump this after writing vehicles so API read caches drop stale entries
+        self.cache_generation = cache_generation
+        # Encoded preview frames from the workers, fanned out to every viewer
+        self.preview = PreviewHub(self._ctx, list(cameras))
+        groups = {}
+        for name, camera_config in cameras.items():
+            groups.setdefault(camera_config.get("group", name), {})[name] = camera_config
+        self.workers = {name: CameraWorker(name, group) for name, group in groups.items()}
+        # Camera name -> worker name, so endpoints can address either
+        self.worker_names = {camera: name for name, group in groups.items() for camera in group}
+        self.worker_names.update({name: name for name in groups})
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.poll_interval = poll_interval
+        self._shutdown = threading.Event()
+        self._monitor = threading.Thread(target=self._run_monitor, name="camera-supervisor", daemon=True)
+        self._monitor.start()
+
+    def _spawn(self, worker):
+        worker.stop_event = self._ctx.Event()
+        worker.process = self._ctx.Process(
+            target=run_worker,
+            args=(worker.name, worker.cameras, worker.stop_event, self.metrics_queue),
+            kwargs={
+                "preview_queue": self.preview.queue,
+                "viewers": {camera: self.preview.viewers[camera] for camera in worker.cameras},
+                "cache_generation": self.cache_generation,
+            },
+            name=f"camera-{worker.name}",
+            daemon=False,
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        logger.info("Started camera %s (pid %s)", worker.name, worker.process.pid)
+
+    def start(self, name):
+        worker = self.workers[self.worker_names[name]]
+        with self._lock:
+            worker.desired = True
+            if not worker.is_alive():
+                worker.backoff = 0.0
+                self._spawn(worker)
+
+    def start_all(self):
+        for name in self.workers:
+            self.start(name)
+
+    def stop(self, name, timeout=10.0):
+        worker = self.workers[self.worker_names[name]]
+        with self._lock:
+            worker.desired = False
+            if not worker.is_alive():
+                return
+            worker.stop_event.set()
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                logger.warning("Camera %s did not stop in %.0fs, terminating", name, timeout)
+                worker.process.terminate()
+                worker.process.join()
+            worker.last_exitcode = worker.process.exitcode
+
+    def stop_all(self):
+        for name in self.workers:
+            self.stop(name)
+
+    def _run_monitor(self):
+        while not self._shutdown.wait(self.poll_interval):
+            self._drain_metrics()
+            with self._lock:
+                for worker in self.workers.values():
+                    if worker.desired and not worker.is_alive():
+                        self._handle_exit(worker)
+
+    def _drain_metrics(self):
+        while True:
+            try:
+                snapshot = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.metrics[snapshot["camera"]] = snapshot
+
+    def metrics_snapshots(self):
+        return [self.metrics[camera] for camera in sorted(self.metrics)]
+
+    def _handle_exit(self, worker):
+        now = time.monotonic()
+        if worker.process is not None:
+            # First time we notice this exit: schedule the restart
+            worker.last_exitcode = worker.process.exitcode
+            worker.process = None
+            if worker.last_exitcode == EXIT_ALREADY_RUNNING:
+                worker.desired = False
+                return
+            if now - worker.started_at >= self.stable_after:
+                worker.backoff = 0.0
+            worker.backoff = min(max(worker.backoff * 2, self.min_backoff), self.max_backoff)
+            worker.next_start = now + worker.backoff
+            logger.warning("Camera %s exited with code %s, restarting in %.0fs",
+                           worker.name, worker.last_exitcode, worker.backoff)
+        elif now >= worker.next_start:
+            worker.restarts += 1
+            self._spawn(worker)
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "cameras": list(worker.cameras),
+                    "running": worker.is_alive(),
+                    "desired": worker.desired,
+                    "pid": worker.process.pid if worker.is_alive() else None,
+                    "restarts": worker.restarts,
+                    "last_exitcode": worker.last_exitcode,
+                    "uptime": now - worker.started_at if worker.is_alive() else None,
+                    "restart_in": max(worker.next_start - now, 0.0)
+                    if worker.desired and not worker.is_alive() else None,
+                }
+                for name, worker in self.workers.items()
+            }
+
+    def shutdown(self):
+        self._shutdown.set()
+        self._monitor.join()
+        self.stop_all()
+        self.preview.close()
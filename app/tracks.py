@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+
+
+class TrackState:
+    """Per-track counting state; one small fixed-layout record per track ID."""
+
+    __slots__ = ("track_id", "last_frame", "last_seen", "position", "visits", "counted")
+
+    def __init__(self, track_id, frame, now):
+        self.track_id = track_id
+        self.last_frame = frame
+        self.last_seen = now
+        self.position = None  # last known (x, y), the start of the next path segment
+        self.visits = ()  # recent zone indexes in order of entry
+        self.counted = 0  # bitmask of rules (directions) already counted
+
+
+class TrackStore:
+    """Track states with O(1) lookup and eviction of tracks that stopped appearing.
+
+    Records are kept in last-seen order, so eviction only looks at the stale
+    ones at the front. A track is evicted when it has not been seen for
+    max_age_frames processed frames or ttl seconds (either may be None).
+    """
+
+    def __init__(self, max_age_frames=300, ttl=None):
+        self.max_age_frames = max_age_frames
+        self.ttl = ttl
+        self.frame = 0
+        self.evicted = 0
+        self._tracks = OrderedDict()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def get(self, track_id):
+        return self._tracks.get(track_id)
+
+    def touch(self, track_id, now=None):
+        """Return the state for track_id, creating it if needed, and mark it seen this frame."""
+        now = time.monotonic() if now is None else now
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = TrackState(track_id, self.frame, now)
+        else:
+            state.last_frame = self.frame
+            state.last_seen = now
+            self._tracks.move_to_end(track_id)
+        return state
+
+    def remap(self, zones, rules):
+        """Renumber the zone and rule indexes of every track; zones and rules map old to new indexes."""
+        for state in self._tracks.values():
+            state.visits = tuple(zones[zone] for zone in state.visits if zone in zones)
+            state.counted = _remap_bits(state.counted, rules)
+
+    def next_frame(self, now=None):
+        """Advance the frame counter and evict stale tracks; call once per processed frame."""
+        self.frame += 1
+        self.evict(now)
+
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self._tracks:
+            state = next(iter(self._tracks.values()))
+            stale_frames = self.max_age_frames is not None and self.frame - state.last_frame > self.max_age_frames
+            stale_time = self.ttl is not None and now - state.last_seen > self.ttl
+            if not (stale_frames or stale_time):
+                break
+            self._tracks.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self):
+        return {"active": len(self._tracks), "evicted": self.evicted}
+
+
+def _remap_bits(mask, mapping):
+    return sum(1 << new for old, new in mapping.items() if mask & (1 << old))
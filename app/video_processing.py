@@ -1,80 +1,355 @@
 import cv2
-import numpy as np
-from ultralytics import YOLO
-from vidgear.gears import CamGear
+import cvzone
+import logging
 import os
-from datetime import datetime
+import time
+from functools import partial
+from .capture import FrameRingBuffer, CaptureThread, FrameSampler
+from .sources import open_stream
+from .zones import FRAME_SIZE, ZoneIndex
+from .zone_config import DEFAULT_RULES, DEFAULT_ZONES, UP_DOWN_RULES, ZoneStore, ZoneWatcher
+from .crossing import CrossingEngine, rule_from_config
+from .pipeline import STOP, Pipeline, Stage
+from .snapshots import SnapshotWriter
+from .storage import SnapshotStore
+from .events import EventSink
+from .inference import Detections, RoiDetector, YoloDetector
+from .motion import MotionGate
+from .tracks import TrackStore
+from .metrics import ProcessorMetrics
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình của cam_truoc / cam_sau / main.py: "up" khi xe đi từ area1 sang area2, "down" khi ngược lại,
+# nhãn trên ảnh là track ID và tên loại xe
+UP_DOWN_OPTIONS = {
+    "rules": UP_DOWN_RULES,
+    "labels": "class",
+}
+# Màu vẽ các khu vực, lặp lại khi có nhiều khu vực
+ZONE_COLORS = [(255, 0, 0), (0, 255, 0)]
+# Tên các loại xe COCO, cho labels="class"
+CLASS_NAMES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "coco.txt")
+
+
+class FramePacket:
+    """One frame on its way through the pipeline stages of a VideoProcessor."""
+
+    __slots__ = ("seq", "captured_at", "done_at", "image", "detections", "skipped", "preview", "annotate")
+
+    def __init__(self, seq, image, captured_at):
+        self.seq = seq
+        self.captured_at = captured_at  # time.monotonic() lúc đọc từ camera
+        self.done_at = None  # time.monotonic() khi ra khỏi bước cuối (vẽ)
+        self.image = image
+        self.detections = None
+        self.skipped = False  # motion gate: detector not run on this frame
+        self.preview = False  # frame goes to the live preview
+        self.annotate = False  # draw on the frame itself (not only on snapshots)
+
+
+class DetectStage(Stage):
+    """Takes the newest captured frame (at most max_fps per second), resizes it and runs the detector
+    and tracker, unless the motion gate says the road is idle.
+
+    The frame is taken only once the previous one has been through the
+    detector, so it is never stale by a detector run, and frames the detector
+    cannot keep up with are dropped by the ring buffer before being resized.
+    """
+
+    name = "detect"
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.last_seq = 0
+        self.active = False  # Lần nhận diện gần nhất có xe
+
+    def read(self):
+        processor = self.processor
+        processor.sampler.wait()
+        t = time.perf_counter()
+        latest = processor.frame_buffer.get_latest(self.last_seq, timeout=processor.poll_interval)
+        if latest is None:
+            # Stream đã kết thúc và không còn khung hình nào
+            return STOP if processor.frame_buffer.closed else None
+        self.last_seq, captured_at, frame = latest
+        t = processor.metrics.lap('read', t)
+        if frame.shape[1] != FRAME_SIZE[0] or frame.shape[0] != FRAME_SIZE[1]:
+            frame = cv2.resize(frame, FRAME_SIZE)  # Resize khung hình (decoder="ffmpeg" đã scale sẵn)
+        processor.metrics.lap('resize', t)
+        return FramePacket(self.last_seq, frame, captured_at)
+
+    def process(self, item):
+        packet = self.read()
+        if packet is None or packet is STOP:
+            return packet
+        processor = self.processor
+        processor.metrics.frame_started(packet.captured_at)
+        t = time.perf_counter()
+        gate = processor.motion_gate
+        packet.skipped = gate is not None and not self.active and not gate.moving(packet.image)
+        if packet.skipped:
+            # Đường trống: không chạy model, trạng thái xe giữ nguyên
+            processor.metrics.frame_skipped()
+            packet.detections = Detections.empty()
+            processor.metrics.lap('motion', t)
+            return packet
+        # Nhận diện và theo dõi xe trong khung hình bằng YOLO
+        packet.detections = processor.detector.track(packet.image)
+        self.active = len(packet.detections) > 0
+        latency = processor.metrics.lap('detect', t) - t
+        if processor.target_latency is not None:
+            if self.active:
+                processor.sampler.adapt(latency, processor.target_latency)
+            else:
+                processor.sampler.reset()
+        return packet
+
+
+class CountStage(Stage):
+    """Advances every track along its path, counts crossings and records the counted vehicles."""
+
+    name = "count"
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def process(self, packet):
+        processor = self.processor
+        # Áp dụng cấu hình khu vực mới (nếu có) giữa hai khung hình
+        processor.reload_zones()
+        t = time.perf_counter()
+        detections = packet.detections
+        track_ids = detections.track_ids.tolist()  # Lấy track ID của xe
+        if not packet.skipped:
+            processor.tracks.next_frame()
+            # seq đếm cả khung hình bị bỏ, nên dùng số khung hình đã nhận diện để log đều mỗi 100 khung hình
+            if processor.tracks.frame % 100 == 0 and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s track ids: %s", processor.name, track_ids)
+
+        packet.preview = processor.preview is not None and processor.preview.wants_frame()
+        packet.annotate = not processor.headless or packet.preview
+
+        # Đường đi của từng xe từ khung hình trước, kiểm tra với mọi luật đếm trong một phép tính
+        states = [processor.tracks.touch(track_id) for track_id in track_ids]
+        for i, direction in processor.crossings.update(states, processor.zones.centroids(detections.boxes)):
+            processor.record_vehicle(packet, i, direction)
+        processor.metrics.lap('zones', t)
+        return packet
+
+
+class DrawStage(Stage):
+    """Draws the zones and publishes the frame to the live preview."""
+
+    name = "draw"
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def process(self, packet):
+        processor = self.processor
+        t = time.perf_counter()
+        # Vẽ khu vực trên khung hình
+        if packet.annotate:
+            processor.draw_areas(packet.image)
+            if packet.preview:
+                processor.preview.publish(packet.image)
+            processor.metrics.lap('draw', t)
+        if not packet.skipped:
+            processor.metrics.frame_done()
+        # Độ trễ từ lúc đọc từ camera đến khi xử lý xong khung hình
+        packet.done_at = time.monotonic()
+        processor.metrics.observe('end_to_end', packet.done_at - packet.captured_at)
+        return packet
+
 
 class VideoProcessor:
-    def __init__(self, source, model_path, cam_path):
+    """Đếm xe của một camera: đọc + resize + nhận diện/theo dõi → đếm → vẽ, mỗi bước một thread.
+
+    Các bước nối với nhau bằng hàng đợi giới hạn (app.pipeline), nên khi model đang nhận diện
+    một khung hình thì khung hình trước đang được đếm/vẽ. Khung hình tiếp theo chỉ được lấy
+    (mới nhất) khi model rảnh, các khung hình ở giữa bị bỏ trong bộ đệm mà không cần resize.
+    Mỗi camera là một cấu hình của lớp này (rules, labels, ...) trong config.CAMERAS, vd. UP_DOWN_OPTIONS.
+    """
+
+    def __init__(self, source, model_path, cam_path, max_fps=None, snapshot_writer=None, event_sink=None,
+                 detector=None, name=None, max_track_age=300, headless=False, roi_padding=None, roi_scale=1.0,
+                 motion_gate=False, target_latency=None, min_fps=None, model_imgsz=None,
+                 retention_days=None, max_snapshot_bytes=None, rules=None, zones_dir=None, labels="direction",
+                 queue_size=1, poll_interval=0.5, decoder="camgear", snapshot_crop=False, jpeg_quality=90,
+                 snapshot_policy="degrade"):
         # Khởi tạo camera stream và model YOLO
-        self.stream = CamGear(source=source, stream_mode=True, logging=True).start()
-        self.model = YOLO(model_path)  # Load mô hình YOLO
-        
+        # source có thể là URL/đường dẫn, hoặc một stream có read() (vd. app.replay.ReplaySource)
+        # decoder="ffmpeg": FFmpeg scale ngay khi giải mã ra kích thước xử lý và bỏ các khung hình
+        # vượt quá max_fps trước khi scale/chuyển màu (xem app.sources)
+        self.stream = source if hasattr(source, 'read') else open_stream(source, decoder, max_fps)
+        # detector có thể là StreamHandle của InferenceServer dùng chung model;
+        # model_path có thể là model ONNX/OpenVINO đã export, khi đó model_imgsz là kích thước lúc export
+        self.detector = detector or YoloDetector(model_path, imgsz=model_imgsz)
+
+        # Đọc khung hình trong thread riêng, chỉ giữ khung hình mới nhất
+        self.frame_buffer = FrameRingBuffer()
+        self.capture = CaptureThread(self.stream, self.frame_buffer)
+        self.capture.start()
+        # Giới hạn số lần nhận diện mỗi giây; khi có target_latency, khoảng cách giữa hai lần
+        # nhận diện giãn ra (tối đa 1 / min_fps) nếu model chạy chậm hơn target_latency giây
+        self.sampler = FrameSampler(max_fps, min_fps)
+        self.target_latency = target_latency
+        self.poll_interval = poll_interval
+
         # Khởi tạo các khu vực và lưu trữ phương tiện
-        self.area1 = [(200, 100), (600, 100), (600, 200), (200, 200)]  # Khu vực 1
-        self.area2 = [(300, 300), (800, 300), (1000, 400), (300, 400)]  # Khu vực 2
-        self.vehicle_in_area1 = {}  # Lưu thông tin xe trong area1
-        self.vehicle_in_area2 = {}  # Lưu thông tin xe trong area2
+        self.zones = ZoneIndex(DEFAULT_ZONES)  # Biên dịch khu vực một lần
+        # Luật đếm: chuỗi khu vực ({"name", "zones"}) hoặc vạch có hướng ({"name", "line"}), xem app.crossing
+        self.default_rules = rules or DEFAULT_RULES
+        self.crossings = CrossingEngine(self.zones, [rule_from_config(rule) for rule in self.default_rules])
+        # roi_padding: chỉ nhận diện trong hình chữ nhật bao các khu vực (nới thêm roi_padding px),
+        # roi_scale > 1 phóng to vùng này trước khi đưa vào model
+        self.roi_padding = roi_padding
+        if roi_padding is not None:
+            self.detector = RoiDetector(self.detector, self.zones.bounding_rect(roi_padding), roi_scale)
+        # motion_gate: khi không có xe nào, chỉ nhận diện nếu có chuyển động trong các khu vực
+        self.motion_gate = MotionGate(self.zones.label_map != 0) if motion_gate else None
+        # Trạng thái từng xe (đã vào area1/area2); xe không xuất hiện sau max_track_age khung hình bị xóa
+        self.tracks = TrackStore(max_age_frames=max_track_age)
         self.save_dir = cam_path  # Thư mục để lưu ảnh
+        self.name = name or os.path.basename(os.path.normpath(cam_path))  # Tên camera
         os.makedirs(self.save_dir, exist_ok=True)  # Tạo thư mục nếu chưa tồn tại
-        self.vehicle_count = 0  # Đếm số lượng xe
+        # Ghi ảnh trong thread nền, thread nhận diện không ghi file
+        # Ảnh lưu theo ngày/giờ trong thư mục camera, có index và tự xóa ảnh cũ theo retention_days / max_snapshot_bytes
+        self.snapshot_store = SnapshotStore(self.save_dir, retention_days, max_snapshot_bytes)
+        # snapshot_crop: chỉ lưu vùng quanh xe; snapshot_policy: xử lý khi hàng đợi ghi ảnh đầy
+        # ("block", "drop" hoặc "degrade", xem app.snapshots)
+        self.snapshot_writer = snapshot_writer or SnapshotWriter(
+            policy=snapshot_policy, jpeg_quality=jpeg_quality, crop=snapshot_crop,
+            on_written=self.snapshot_store.record)
+        # Gom sự kiện xe qua vạch và ghi vào bảng vehicles theo lô
+        self.event_sink = event_sink or EventSink(
+            camera=self.name, spill_path=os.path.join(self.save_dir, 'pending_events.ndjson'))
+        self.counts = {}  # Số xe đã đếm theo từng luật (hướng)
+        # labels: "direction" vẽ track ID và hướng lên ảnh, "class" vẽ track ID và loại xe
+        self.labels = labels
+        self.class_names = self.load_class_names(CLASS_NAMES_PATH) if labels == "class" else None
+        # Thời gian từng bước, xuất ra /metrics
+        self.metrics = ProcessorMetrics(self.name)
+        # headless: không vẽ lên khung hình, chỉ vẽ trên ảnh lưu (trong thread ghi ảnh)
+        # hoặc khi có người xem preview (preview có wants_frame() và publish(frame))
+        self.headless = headless
+        self.preview = None
+        # Khu vực và luật đếm lưu theo phiên bản trong zones_dir (app.zone_config); phiên bản mới
+        # được áp dụng giữa hai khung hình, không khởi động lại stream hay model
+        self.zone_watcher = ZoneWatcher(ZoneStore(zones_dir), self.name) if zones_dir else None
+        self.reload_zones()
+        self.pipeline = Pipeline([DetectStage(self), CountStage(self), DrawStage(self)],
+                                 queue_size=queue_size, name=self.name).start()
 
-    def is_in_area(self, point, area):
+    @staticmethod
+    def load_class_names(filepath):
+        with open(filepath, "r") as f:
+            return f.read().splitlines()
+
+    def is_in_area(self, point, area_name):
         # Hàm kiểm tra một điểm có nằm trong khu vực không
-        return cv2.pointPolygonTest(np.array(area, dtype=np.int32), point, False) >= 0
-
-    def process_frame(self):
-        # Đọc một khung hình từ camera stream
-        frame = self.stream.read()
-        frame = cv2.resize(frame, (1020, 500))  # Resize khung hình
-
-        # Nhận diện xe trong khung hình bằng YOLO
-        results = self.model(frame)
-        boxes = results[0].boxes.xyxy.int().cpu().tolist()  # Lấy bounding boxes
-        if results[0].boxes.id is not None:
-            track_ids = results[0].boxes.id.int().cpu().tolist()  # Lấy track ID của xe
-        else:
-            track_ids = []  # Hoặc xử lý theo cách khác nếu không có ID
-        # Xử lý từng bounding box và track ID
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = box
-            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # Tính trung tâm bounding box
-
-            # Kiểm tra xem xe có đang ở trong area1 không
-            if self.is_in_area((cx, cy), self.area1):
-                if track_id not in self.vehicle_in_area1:
-                    self.vehicle_in_area1[track_id] = (cx, cy)
-                    self.vehicle_count += 1  # Đếm số xe vào
-                    self.record_vehicle(frame, box, track_id, "into area1")
-            
-            # Kiểm tra xem xe có đang ở trong area2 không
-            if self.is_in_area((cx, cy), self.area2):
-                if track_id not in self.vehicle_in_area2:
-                    self.vehicle_in_area2[track_id] = (cx, cy)
-                    self.record_vehicle(frame, box, track_id, "into area2")
+        return self.zones.contains(point, area_name)
 
-        # Vẽ khu vực trên khung hình
-        self.draw_areas(frame)
-        return frame
+    def reload_zones(self):
+        # Áp dụng cấu hình khu vực mới nếu có; chỉ vẽ lại các khu vực đã thay đổi
+        config = self.zone_watcher.poll() if self.zone_watcher is not None else None
+        if config is None:
+            return False
+        try:
+            zones = self.zones.updated(config["zones"])
+            rules = [rule_from_config(rule) for rule in config.get("rules") or self.default_rules]
+            crossings = self.crossings.reconfigured(zones, rules, self.tracks)
+        except (KeyError, TypeError, ValueError):
+            # Giữ cấu hình đang chạy nếu phiên bản mới không dùng được (vd. luật mặc định cần area1)
+            logger.exception("%s: cannot apply zone configuration v%s", self.name, config.get("version"))
+            return False
+        self.zones, self.crossings = zones, crossings
+        if self.roi_padding is not None:
+            self.detector.set_rect(zones.bounding_rect(self.roi_padding))
+        if self.motion_gate is not None:
+            self.motion_gate = MotionGate(zones.label_map != 0)
+        logger.info("%s: zone configuration v%s applied", self.name, config["version"])
+        return True
+
+    def next_packet(self, timeout=1.0):
+        # FramePacket tiếp theo đã qua mọi bước (có captured_at / done_at); None nếu chưa có
+        return self.pipeline.get(timeout)
+
+    def process_frame(self, timeout=1.0):
+        # Khung hình tiếp theo đã xử lý xong (đã vẽ nếu không headless); None nếu chưa có
+        packet = self.next_packet(timeout)
+        return None if packet is None else packet.image
+
+    @property
+    def closed(self):
+        # Stream đã kết thúc (hoặc một bước bị lỗi) và mọi khung hình đã ra khỏi pipeline
+        return self.pipeline.closed
 
     def draw_areas(self, frame):
-        # Vẽ khu vực area1 và area2
-        cv2.polylines(frame, [np.array(self.area1, dtype=np.int32)], isClosed=True, color=(255, 0, 0), thickness=2)
-        cv2.polylines(frame, [np.array(self.area2, dtype=np.int32)], isClosed=True, color=(0, 255, 0), thickness=2)
+        # Vẽ các khu vực (mặc định area1 và area2)
+        for i, polygon in enumerate(self.zones.polygons.values()):
+            cv2.polylines(frame, [polygon], isClosed=True, color=ZONE_COLORS[i % len(ZONE_COLORS)], thickness=2)
 
-    def record_vehicle(self, frame, box, track_id, direction):
-        # Vẽ bounding box và lưu ảnh phương tiện
-        x1, y1, x2, y2 = box
+    def draw_vehicle(self, frame, offset, box, track_id, label):
+        # Vẽ bounding box; offset là góc trên trái của frame trong tọa độ khung hình gốc
+        x1, y1, x2, y2 = box[0] - offset[0], box[1] - offset[1], box[2] - offset[0], box[3] - offset[1]
         cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-        cv2.putText(frame, f'Track ID: {track_id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        cv2.putText(frame, f'{direction}', (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        if self.labels == "class":
+            cvzone.putTextRect(frame, f'{track_id}', (x1, y2), 1, 1)
+            cvzone.putTextRect(frame, f'{label}', (x1, y1), 1, 1)
+        else:
+            cv2.putText(frame, f'Track ID: {track_id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            cv2.putText(frame, f'{label}', (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    def record_vehicle(self, packet, index, direction):
+        # Vẽ bounding box và lưu ảnh phương tiện thứ index của packet
+        t = time.perf_counter()
+        detections = packet.detections
+        box = detections.boxes[index].tolist()
+        track_id = int(detections.track_ids[index])
+        label = self.class_names[detections.class_ids[index]] if self.labels == "class" else direction
+        self.counts[direction] = self.counts.get(direction, 0) + 1
+        if packet.annotate:
+            self.draw_vehicle(packet.image, (0, 0), box, track_id, label)
+            annotate = None
+        else:
+            # Headless: chỉ vẽ lên bản sao của ảnh, trong thread ghi ảnh
+            annotate = partial(self.draw_vehicle, box=box, track_id=track_id, label=label)
 
         # Lưu ảnh phương tiện
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_path = os.path.join(self.save_dir, f'vehicle_{track_id}_{timestamp}.jpg')
-        cv2.imwrite(image_path, frame)
+        image_path = self.snapshot_store.path_for(track_id)
+        if not self.snapshot_writer.submit(packet.image, image_path, box, annotate):
+            # Hàng đợi ghi ảnh đầy (snapshot_policy "drop"/"degrade"): xe vẫn được ghi nhận nhưng không có ảnh
+            image_path = None
+            self.metrics.snapshot_missing()
+        self.event_sink.add(track_id, direction, image_path)
+        self.metrics.lap('snapshot', t)
+        self.metrics.count_vehicle(direction)
+
+    def get_vehicle_count(self, direction=None):
+        # Số xe đã đếm theo hướng direction (mặc định: luật đếm đầu tiên, vd. "into area1")
+        return self.counts.get(direction or self.crossings.rules[0].name, 0)
+
+    def get_capture_stats(self):
+        # Số khung hình bị bỏ, tuổi khung hình và FPS đọc từ camera
+        return self.frame_buffer.stats()
+
+    def get_track_stats(self):
+        # Số xe đang được theo dõi và số xe đã bị xóa khỏi bộ nhớ
+        return self.tracks.stats()
+
+    def metrics_snapshot(self):
+        # Số liệu gửi về supervisor để hiển thị ở /metrics
+        return self.metrics.collect(self.frame_buffer.stats(), self.tracks.stats(),
+                                    self.snapshot_writer.stats(), self.event_sink.stats(), self.sampler.interval)
 
-    def get_vehicle_count(self):
-        # Trả về số lượng xe đã đếm được
-        return self.vehicle_count
+    def stop(self):
+        self.capture.stop()
+        self.stream.stop()
+        self.capture.join(timeout=2)
+        # Dừng các bước trước khi đóng ảnh/sự kiện mà bước đếm còn có thể ghi vào
+        self.pipeline.stop()
+        self.snapshot_writer.close()
+        self.snapshot_store.close()
+        self.event_sink.close()
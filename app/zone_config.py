@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Zones of a camera that has no saved zone configuration
+DEFAULT_ZONES = {
+    "area1": [(200, 100), (600, 100), (600, 200), (200, 200)],
+    "area2": [(300, 300), (800, 300), (1000, 400), (300, 400)],
+}
+
+# Counting rules of a camera that sets none: each vehicle is counted once on entering each zone
+DEFAULT_RULES = [{"name": "into area1", "zones": ["area1"]}, {"name": "into area2", "zones": ["area2"]}]
+# "up" when a vehicle goes from area1 to area2, "down" the other way (the cam_truoc / cam_sau configuration)
+UP_DOWN_RULES = [{"name": "up", "zones": ["area1", "area2"]}, {"name": "down", "zones": ["area2", "area1"]}]
+
+# Each zone owns one bit of the label map (see app.zones.ZoneIndex)
+MAX_ZONES = 32
+
+_VERSION_FILE = re.compile(r"^v(\d+)\.json$")
+
+
+class VersionConflict(Exception):
+    """Another zone configuration was saved since the version the caller edited."""
+
+    def __init__(self, current):
+        super().__init__(f"zone configuration is at version {current}")
+        self.current = current
+
+
+def _point(value, what):
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        raise ValueError(f"{what}: expected an [x, y] point, got {value!r}")
+    return [int(round(value[0])), int(round(value[1]))]
+
+
+def validate(zones, rules=None):
+    """Check and normalise a zone configuration; raises ValueError on the first problem.
+
+    zones maps names to polygons of at least three [x, y] points. rules is
+    None (the processor keeps its own rules) or a list of app.crossing rule
+    configs, whose zone names must exist in zones.
+    """
+    if not isinstance(zones, dict) or not zones:
+        raise ValueError("zones: expected a non-empty object of name -> polygon")
+    if len(zones) > MAX_ZONES:
+        raise ValueError(f"zones: at most {MAX_ZONES} zones are supported")
+    normalised = {}
+    for name, polygon in zones.items():
+        if not isinstance(name, str) or not name:
+            raise ValueError("zones: names must be non-empty strings")
+        if not isinstance(polygon, (list, tuple)) or len(polygon) < 3:
+            raise ValueError(f"zones.{name}: expected at least 3 points")
+        normalised[name] = [_point(point, f"zones.{name}") for point in polygon]
+    if rules is None:
+        return normalised, None
+    if not isinstance(rules, list):
+        raise ValueError("rules: expected a list")
+    checked, names = [], set()
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict) or not isinstance(rule.get("name"), str) or not rule["name"]:
+            raise ValueError(f"rules[{i}]: expected an object with a name")
+        if rule["name"] in names:
+            raise ValueError(f"rules[{i}]: duplicate rule name {rule['name']!r}")
+        names.add(rule["name"])
+        if ("zones" in rule) == ("line" in rule):
+            raise ValueError(f"rules[{i}]: set exactly one of zones or line")
+        if "line" in rule:
+            line = rule["line"]
+            if not isinstance(line, (list, tuple)) or len(line) != 2:
+                raise ValueError(f"rules[{i}].line: expected two points")
+            checked.append({"name": rule["name"], "line": [_point(p, f"rules[{i}].line") for p in line]})
+        else:
+            sequence = rule["zones"]
+            if not isinstance(sequence, list) or not sequence:
+                raise ValueError(f"rules[{i}].zones: expected a non-empty list of zone names")
+            unknown = [zone for zone in sequence if zone not in normalised]
+            if unknown:
+                raise ValueError(f"rules[{i}].zones: unknown zones {unknown}")
+            checked.append({"name": rule["name"], "zones": list(sequence)})
+    return normalised, checked
+
+
+class ZoneStore:
+    """Versioned JSON zone configurations, one directory per camera.
+
+    Every save writes a new root/<camera>/v<N>.json and never rewrites an
+    old one, so earlier versions stay readable and a reader always sees a
+    complete file. The file is linked into place, so of two concurrent saves
+    of the same version exactly one wins and the other gets VersionConflict.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, camera):
+        if not camera or camera.startswith(".") or os.path.basename(camera) != camera:
+            raise ValueError(f"invalid camera name {camera!r}")
+        return os.path.join(self.root, camera)
+
+    def versions(self, camera):
+        try:
+            names = os.listdir(self._dir(camera))
+        except FileNotFoundError:
+            return []
+        return sorted(int(match.group(1)) for match in map(_VERSION_FILE.match, names) if match)
+
+    def load(self, camera, version=None):
+        """Return the given (default: latest) configuration of camera, or None if there is none."""
+        if version is None:
+            versions = self.versions(camera)
+            if not versions:
+                return None
+            version = versions[-1]
+        try:
+            with open(os.path.join(self._dir(camera), f"v{version}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, camera, zones, rules=None, expected_version=None, default_rules=None):
+        """Validate and store a new version; expected_version guards against lost updates.
+
+        default_rules are the rules the camera falls back to when rules is
+        None; the zones are checked against them, but they are not stored.
+        """
+        zones, rules = validate(zones, rules)
+        if rules is None and default_rules is not None:
+            validate(zones, default_rules)
+        directory = self._dir(camera)
+        os.makedirs(directory, exist_ok=True)
+        versions = self.versions(camera)
+        current = versions[-1] if versions else 0
+        if expected_version is not None and expected_version != current:
+            raise VersionConflict(current)
+        config = {
+            "version": current + 1,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "zones": zones,
+            "rules": rules,
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, os.path.join(directory, f"v{current + 1}.json"))
+            except FileExistsError:
+                raise VersionConflict(current + 1) from None
+        finally:
+            os.unlink(tmp_path)
+        logger.info("Saved zone configuration v%d for %s", current + 1, camera)
+        return config
+
+    def stamp(self, camera):
+        """Cheap change marker for camera's directory; differs after every save."""
+        try:
+            return os.stat(self._dir(camera)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+class ZoneWatcher:
+    """Polls a ZoneStore for new versions of one camera's configuration.
+
+    poll() costs one stat() at most every interval seconds and returns a
+    configuration only once, the first time a newer version is seen.
+    """
+
+    def __init__(self, store, camera, interval=1.0):
+        self.store = store
+        self.camera = camera
+        self.interval = interval
+        self.version = 0
+        self._stamp = None
+        self._next_check = 0.0
+
+    def poll(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        stamp = self.store.stamp(self.camera)
+        if stamp is None or stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        config = self.store.load(self.camera)
+        if config is None or config["version"] == self.version:
+            return None
+        self.version = config["version"]
+        return config
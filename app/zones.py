@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+# Processing resolution used by every VideoProcessor (width, height)
+FRAME_SIZE = (1020, 500)
+
+
+class ZoneIndex:
+    """Zones compiled once into a rasterized label map.
+
+    Each zone owns one bit of the label map, so overlapping zones are allowed
+    and the membership of any point is a single array lookup. Each zone's
+    rasterized mask is kept, so updated() only redraws the zones that changed.
+    """
+
+    def __init__(self, zones, size=FRAME_SIZE, reuse=None):
+        self.width, self.height = size
+        self.names = list(zones)
+        if len(self.names) > 32:
+            raise ValueError("ZoneIndex supports at most 32 zones")
+        if len(self.names) <= 8:
+            self.dtype = np.uint8
+        elif len(self.names) <= 16:
+            self.dtype = np.uint16
+        else:
+            self.dtype = np.uint32
+        self.label_map = np.zeros((self.height, self.width), dtype=self.dtype)
+        self.bits = (1 << np.arange(len(self.names))).astype(self.dtype)
+        self.polygons = {}
+        self.masks = {}
+        if reuse is not None and (reuse.width, reuse.height) != size:
+            reuse = None
+        for name in self.names:
+            polygon = np.array(zones[name], dtype=np.int32)
+            previous = reuse.polygons.get(name) if reuse is not None else None
+            if previous is not None and np.array_equal(previous, polygon):
+                mask = reuse.masks[name]
+            else:
+                mask = self._rasterize(polygon)
+            self.label_map[mask] |= self.bits[self.names.index(name)]
+            self.polygons[name] = polygon
+            self.masks[name] = mask
+
+    def updated(self, zones):
+        """Return a ZoneIndex for zones that rasterizes only the polygons that differ from this one."""
+        return ZoneIndex(zones, (self.width, self.height), reuse=self)
+
+    def _rasterize(self, polygon):
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        cv2.fillPoly(mask, [polygon], 1)
+        return mask.astype(bool)
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def labels(self, points):
+        """Return the raw label-map value for each (x, y) point; 0 outside the frame."""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        xs, ys = points[:, 0], points[:, 1]
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        labels = np.zeros(len(points), dtype=self.dtype)
+        labels[inside] = self.label_map[ys[inside], xs[inside]]
+        return labels
+
+    def membership(self, points):
+        """Return an (N, len(names)) bool array: whether each point lies in each zone."""
+        return (self.labels(points)[:, None] & self.bits) != 0
+
+    def contains(self, point, name):
+        return bool(self.labels([point])[0] & self.bits[self.index(name)])
+
+    def bounding_rect(self, padding=0):
+        """(x1, y1, x2, y2) rectangle around every zone, grown by padding and clipped to the frame."""
+        points = np.concatenate(list(self.polygons.values()))
+        x1, y1 = points.min(axis=0) - padding
+        x2, y2 = points.max(axis=0) + padding + 1
+        return max(int(x1), 0), max(int(y1), 0), min(int(x2), self.width), min(int(y2), self.height)
+
+    @staticmethod
+    def centroids(boxes):
+        """Centers of an (N, 4) array of xyxy boxes, using the same integer math as before."""
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        return np.stack(((boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2), axis=1)
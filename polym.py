@@ -1,34 +1,88 @@
 import cv2
 import numpy as np
+import json
 import pickle
 import os
 
+from app import config
+from app.zone_config import DEFAULT_RULES, VersionConflict
+
 
 class PolylineManager:
-    def __init__(self):
+    """Draw and name zone polygons; saved as JSON.
+
+    With a camera and an app.zone_config.ZoneStore, zones are loaded from and
+    saved as a new version of that camera's zone configuration, which running
+    processors pick up without a restart. Otherwise they go to polylines.json.
+    Zones from the older polylines.pkl are imported once, while nothing has
+    been saved in the new format yet.
+    """
+
+    def __init__(self, camera=None, store=None):
         self.polylines = []
         self.polyline_names = []
         self.points = []
+        self.json_file = "polylines.json"
         self.pickle_file = "polylines.pkl"
+        self.camera = camera
+        self.store = store
+        self.version = None
+        self.rules = None
         self.load_polylines()
 
     def load_polylines(self):
-        """Load polylines from a pickle file if it exists."""
-        if os.path.exists(self.pickle_file):
-            with open(self.pickle_file, 'rb') as f:
-                self.polylines, self.polyline_names = pickle.load(f)
+        """Load polylines from the zone store or the JSON file if it exists."""
+        if self.store is not None:
+            zone_config = self.store.load(self.camera)
+            if zone_config is None:
+                self.import_pickle()
+                return
+            self.version, self.rules, zones = zone_config["version"], zone_config["rules"], zone_config["zones"]
+        elif os.path.exists(self.json_file):
+            with open(self.json_file) as f:
+                zones = json.load(f)["zones"]
+        else:
+            self.import_pickle()
+            return
+        self.polyline_names = list(zones)
+        self.polylines = [[tuple(point) for point in zones[name]] for name in self.polyline_names]
+
+    def import_pickle(self):
+        """Load zones from polylines.pkl, if it exists, and save them in the new format."""
+        if not os.path.exists(self.pickle_file):
+            return
+        with open(self.pickle_file, 'rb') as f:
+            polylines, polyline_names = pickle.load(f)
+        self.polylines = [[tuple(point) for point in polyline] for polyline in polylines]
+        self.polyline_names = list(polyline_names)
+        print(f"Imported {len(self.polylines)} zones from {self.pickle_file}")
+        self.save_polylines()
+
+    def default_rules(self):
+        """Rules the camera counts with when its zone configuration has none (as PUT /cameras/{name}/zones)."""
+        return config.CAMERAS.get(self.camera, {}).get("rules") or DEFAULT_RULES
 
     def save_polylines(self):
-        """Save polylines to a pickle file."""
-        with open(self.pickle_file, 'wb') as f:
-            pickle.dump((self.polylines, self.polyline_names), f)
+        """Save polylines as a new zone store version, or to the JSON file."""
+        zones = {name: [list(point) for point in polyline]
+                 for name, polyline in zip(self.polyline_names, self.polylines)}
+        if self.store is not None:
+            try:
+                # Saved rules are kept; they fail validation if a zone they use was removed
+                self.version = self.store.save(self.camera, zones, self.rules, expected_version=self.version or 0,
+                                               default_rules=self.default_rules())["version"]
+            except (VersionConflict, ValueError) as e:
+                print(f"Zones not saved: {e}")
+            return
+        with open(self.json_file, "w") as f:
+            json.dump({"zones": zones}, f, indent=2)
 
     def clear_polylines(self):
-        """Clear all polylines, names, and delete the pickle file."""
+        """Clear all polylines and names, and delete the JSON file (zone store versions are kept)."""
         self.polylines.clear()
         self.polyline_names.clear()
-        if os.path.exists(self.pickle_file):
-            os.remove(self.pickle_file)  # Remove the pickle file
+        if self.store is None and os.path.exists(self.json_file):
+            os.remove(self.json_file)  # Remove the JSON file
 
     def add_point(self, point):
         """Add a point to the current list of points."""
@@ -65,7 +119,7 @@ class PolylineManager:
         elif key == ord("s"):
             self.save_polylines()
         elif key == ord("d"):
-            self.clear_polylines()  # Clear polylines and remove the pickle file
+            self.clear_polylines()  # Clear polylines and remove the JSON file
         elif len(self.points) == 4:
             polyline_name = input("Enter a name for the polyline: ")
             self.polyline_names.append(polyline_name)
@@ -0,0 +1,71 @@
+import asyncio
+
+from app import cache as cache_module
+from app.cache import MISSING, TTLCache
+
+
+class Generation:
+    def __init__(self, value=0):
+        self.value = value
+
+    def bump(self):
+        self.value += 1
+
+    async def avalue(self):
+        return self.value
+
+    async def abump(self):
+        self.bump()
+
+
+def test_entries_from_an_older_generation_are_misses():
+    generation = Generation()
+    cache = TTLCache(generation=generation)
+    cache.set("k", 1, generation.value)
+    assert cache.get("k") == 1
+    generation.bump()  # e.g. a camera worker wrote vehicles
+    assert cache.get("k") is MISSING
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0}
+
+
+def test_unknown_generation_disables_caching():
+    cache = TTLCache(generation=Generation(None))
+    cache.set("k", 1, None)
+    assert cache.get("k") is MISSING
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl=2.0, generation=Generation())
+    cache.set("k", 1, 0)
+    now[0] += 1.9
+    assert cache.get("k") == 1
+    now[0] += 0.2
+    assert cache.get("k") is MISSING
+
+
+def test_least_recently_used_entry_goes_first():
+    cache = TTLCache(maxsize=2, generation=Generation())
+    cache.set("a", 1, 0)
+    cache.set("b", 2, 0)
+    cache.get("a")
+    cache.set("c", 3, 0)
+    assert cache.get("b") is MISSING and cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_get_or_load_keeps_the_generation_read_before_loading():
+    generation = Generation()
+    cache = TTLCache(generation=generation)
+
+    async def load():
+        generation.bump()  # a write lands while the value is being loaded
+        return "stale"
+
+    async def main():
+        assert await cache.get_or_load("k", load) == "stale"
+        assert cache.get("k") is MISSING
+        await cache.ainvalidate()
+        assert generation.value == 2
+
+    asyncio.run(main())
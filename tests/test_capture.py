@@ -0,0 +1,58 @@
+from app.capture import CaptureThread, FrameRingBuffer, FrameSampler
+
+
+def test_reader_gets_newest_frame_and_older_ones_count_as_dropped():
+    buffer = FrameRingBuffer(capacity=2)
+    for frame in "abc":
+        buffer.put(frame, timestamp=1.0)
+    seq, timestamp, frame = buffer.get_latest()
+    assert (seq, frame) == (3, "c")
+    # "a" was overwritten in the full buffer and "b" skipped by the reader
+    assert buffer.stats()["dropped"] == 2
+    assert buffer.stats()["consumed"] == 1
+
+
+def test_get_latest_only_returns_newer_frames():
+    buffer = FrameRingBuffer()
+    buffer.put("a")
+    seq, _, _ = buffer.get_latest()
+    assert buffer.get_latest(seq, timeout=0.01) is None
+    buffer.put("b")
+    assert buffer.get_latest(seq, timeout=0.01)[2] == "b"
+
+
+def test_closed_buffer_stops_waiting():
+    buffer = FrameRingBuffer()
+    buffer.close()
+    assert buffer.get_latest(timeout=5) is None
+    assert buffer.closed
+
+
+class ListStream:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self):
+        return self.frames.pop(0) if self.frames else None
+
+
+def test_capture_thread_closes_buffer_at_end_of_stream():
+    buffer = FrameRingBuffer(capacity=8)
+    thread = CaptureThread(ListStream("abc"), buffer)
+    thread.start()
+    thread.join(5)
+    assert buffer.closed
+    assert buffer.stats()["captured"] == 3
+    assert buffer.get_latest()[2] == "c"
+
+
+def test_sampler_interval_adapts_between_max_and_min_fps():
+    sampler = FrameSampler(max_fps=10, min_fps=2)
+    assert sampler.interval == 0.1
+    for _ in range(20):
+        sampler.adapt(latency=1.0, target=0.1)
+    assert sampler.interval == 0.5
+    sampler.adapt(latency=0.05, target=0.1)
+    assert sampler.interval == 0.45
+    sampler.reset()
+    assert sampler.interval == 0.1
@@ -0,0 +1,79 @@
+from app.crossing import CrossingEngine, LineRule, ZoneSequenceRule, rule_from_config
+from app.tracks import TrackStore
+from app.zones import ZoneIndex
+
+ZONES = {
+    "area1": [(100, 100), (300, 100), (300, 200), (100, 200)],
+    "area2": [(100, 300), (300, 300), (300, 400), (100, 400)],
+}
+UP_DOWN = [ZoneSequenceRule("up", ["area1", "area2"]), ZoneSequenceRule("down", ["area2", "area1"])]
+
+
+def run(engine, tracks, path, track_id=1):
+    """Feed one track along path, one point per frame, and return the rule names counted."""
+    counted = []
+    for point in path:
+        tracks.next_frame(now=0)
+        counted += [name for _, name in engine.update([tracks.touch(track_id, now=0)], [point])]
+    return counted
+
+
+def test_zone_sequence_counts_direction_once():
+    engine, tracks = CrossingEngine(ZoneIndex(ZONES), UP_DOWN), TrackStore()
+    assert run(engine, tracks, [(200, 50), (200, 150), (200, 250), (200, 350), (200, 250), (200, 350)]) == ["up"]
+    assert run(engine, tracks, [(200, 350), (200, 250), (200, 150)], track_id=2) == ["down"]
+
+
+def test_zone_sequence_sees_thin_zone_skipped_between_frames():
+    zones = dict(ZONES, thin=[(100, 248), (300, 248), (300, 252), (100, 252)])
+    engine = CrossingEngine(ZoneIndex(zones), [ZoneSequenceRule("through thin", ["area1", "thin", "area2"])])
+    # No processed frame lands inside the 4 px zone, but the path between frames does
+    assert run(engine, TrackStore(), [(200, 150), (200, 350)]) == ["through thin"]
+
+
+def test_first_position_does_not_count_as_entry_path():
+    engine = CrossingEngine(ZoneIndex(ZONES), UP_DOWN)
+    # A track first seen in area2 only entered area2, not area1 on the way
+    assert run(engine, TrackStore(), [(200, 350), (200, 360)]) == []
+
+
+def test_line_rule_counts_only_towards_right_hand_side():
+    # Drawn left to right: counts vehicles moving down the image
+    engine = CrossingEngine(ZoneIndex(ZONES), [LineRule("down", (0, 250), (1000, 250))])
+    assert run(engine, TrackStore(), [(200, 200), (200, 300)]) == ["down"]
+    assert run(engine, TrackStore(), [(200, 300), (200, 200)]) == []
+
+
+def test_line_rule_ignores_paths_past_its_end():
+    engine = CrossingEngine(ZoneIndex(ZONES), [LineRule("down", (0, 250), (100, 250))])
+    assert run(engine, TrackStore(), [(200, 200), (200, 300)]) == []
+
+
+def test_rule_from_config():
+    assert isinstance(rule_from_config({"name": "l", "line": [[0, 0], [1, 1]]}), LineRule)
+    rule = rule_from_config({"name": "z", "zones": ["area1"]})
+    assert isinstance(rule, ZoneSequenceRule) and rule.zones == ["area1"]
+
+
+def test_reconfigured_keeps_progress_of_renamed_indexes():
+    zones = ZoneIndex(ZONES)
+    engine, tracks = CrossingEngine(zones, UP_DOWN), TrackStore()
+    run(engine, tracks, [(200, 150)])
+    # New configuration puts a zone in front, so area1/area2 and the rules change index
+    new_zones = zones.updated(dict({"extra": [(500, 0), (600, 0), (600, 50)]}, **ZONES))
+    engine = engine.reconfigured(new_zones, [UP_DOWN[1], UP_DOWN[0]], tracks)
+    state = tracks.get(1)
+    assert state.visits == (new_zones.index("area1"),)
+    assert run(engine, tracks, [(200, 350)]) == ["up"]
+    assert state.counted == 1 << 1
+
+
+def test_reconfigured_drops_removed_zones_and_rules():
+    zones = ZoneIndex(ZONES)
+    engine, tracks = CrossingEngine(zones, UP_DOWN), TrackStore()
+    run(engine, tracks, [(200, 150), (200, 350)])
+    engine = engine.reconfigured(zones.updated({"area2": ZONES["area2"]}),
+                                 [ZoneSequenceRule("into area2", ["area2"])], tracks)
+    state = tracks.get(1)
+    assert state.visits == (0,)
+    assert state.counted == 0
@@ -0,0 +1,117 @@
+import json
+import time
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.events import EventSink
+
+
+class FakeSink(EventSink):
+    """EventSink whose database is a list; rows with trackId in bad are rejected as constraint violations."""
+
+    def __init__(self, tmp_path, **kwargs):
+        self.rows = []
+        self.down = False
+        self.bad = set()
+        self.writes = 0
+        kwargs.setdefault("batch_size", 10)
+        super().__init__(camera="cam", bind=object(), flush_interval=3600, retry_backoff=0,
+                         spill_path=str(tmp_path / "pending.ndjson"), **kwargs)
+
+    def _write(self, rows):
+        self.writes += 1
+        if self.down:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row["trackId"] in self.bad for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("constraint violated"))
+        self.rows += rows
+
+
+@pytest.fixture
+def sink(tmp_path):
+    sink = FakeSink(tmp_path)
+    yield sink
+    sink.close()
+
+
+def add(sink, *track_ids):
+    for track_id in track_ids:
+        sink.add(track_id, "up", f"vehicle_{track_id}.jpg")
+
+
+def test_flush_writes_buffered_events(sink):
+    add(sink, 1, 2, 3)
+    sink.flush()
+    assert [row["trackId"] for row in sink.rows] == ["1", "2", "3"]
+    assert sink.stats() == {"buffered": 0, "written": 3, "failed_batches": 0, "spilled": 0, "rejected": 0}
+
+
+def test_rejected_rows_are_dead_lettered_and_the_rest_written(sink):
+    sink.bad = {"3", "6"}
+    add(sink, *range(8))
+    sink.flush()
+    assert sorted(int(row["trackId"]) for row in sink.rows) == [0, 1, 2, 4, 5, 7]
+    with open(sink.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [entry["row"]["trackId"] for entry in dead] == ["3", "6"]
+    assert "constraint violated" in dead[0]["error"]
+    assert sink.stats()["rejected"] == 2 and sink.stats()["spilled"] == 0
+
+
+def test_unreachable_database_spills_and_replays(sink, tmp_path):
+    sink.down = True
+    add(sink, 1, 2)
+    sink.flush()
+    assert sink.writes == sink.max_retries
+    assert sink.stats()["spilled"] == 2 and sink.stats()["failed_batches"] == 1
+    sink.down = False
+    add(sink, 3)
+    sink.flush()
+    # New events first, then the spill file is replayed and removed
+    assert [row["trackId"] for row in sink.rows] == ["3", "1", "2"]
+    assert not (tmp_path / "pending.ndjson").exists()
+    assert sink.stats()["spilled"] == 0
+
+
+def test_replay_keeps_unwritten_rows_and_dead_letters_corrupt_lines(tmp_path):
+    sink = FakeSink(tmp_path, batch_size=2)
+    try:
+        sink.down = True
+        add(sink, 1, 2, 3)
+        sink.flush()
+        # Under the flush lock, as the flush thread may be replaying the spill file meanwhile
+        with sink._flush_lock, open(sink.spill_path, "a") as f:
+            f.write('{"createdAt": "2024-01-01T00:0\n')
+        sink.bad = {"2"}
+        sink.down = False
+        sink.flush()
+        assert sorted(row["trackId"] for row in sink.rows) == ["1", "3"]
+        assert sink.stats()["rejected"] == 2
+        assert not (tmp_path / "pending.ndjson").exists()
+    finally:
+        sink.close()
+
+
+def test_background_flush_survives_unexpected_errors(tmp_path):
+    sink = FakeSink(tmp_path)
+    calls = []
+    flush = sink.flush
+
+    def flaky_flush():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        flush()
+
+    sink.flush = flaky_flush
+    try:
+        add(sink, 1)
+        deadline = time.monotonic() + 5
+        while not sink.rows and time.monotonic() < deadline:
+            sink._wake.set()
+            time.sleep(0.01)
+        assert len(calls) >= 2
+        assert [row["trackId"] for row in sink.rows] == ["1"]
+    finally:
+        sink.close()
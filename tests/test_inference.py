@@ -0,0 +1,15 @@
+from app.inference import roi_imgsz
+from app.zones import FRAME_SIZE
+
+
+def test_roi_imgsz_keeps_full_frame_density():
+    width, height = FRAME_SIZE
+    assert roi_imgsz((0, 0, width, height)) == (320, 640)
+    # Default zones with roi_padding=40: fewer pixels than the full-frame pass
+    assert roi_imgsz((160, 60, 1020, 441)) == (256, 544)
+
+
+def test_roi_imgsz_scale_upsamples_and_tuple_imgsz():
+    assert roi_imgsz((160, 60, 1020, 441), scale=1.5) == (384, 832)
+    assert roi_imgsz((160, 60, 1020, 441), full_imgsz=(320, 640)) == (256, 544)
+    assert roi_imgsz((0, 0, 5, 5)) == (32, 32)
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from app.pipeline import STOP, Pipeline, Stage
+
+
+class Source(Stage):
+    name = "source"
+
+    def __init__(self, count):
+        self.items = iter(range(count))
+
+    def process(self, item):
+        return next(self.items, STOP)
+
+
+class Apply(Stage):
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.closed = False
+
+    def process(self, item):
+        return self.function(item)
+
+    def close(self):
+        self.closed = True
+
+
+def drain(pipeline, timeout=5):
+    items = []
+    while not pipeline.closed:
+        item = pipeline.get(timeout)
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def test_items_pass_every_stage_in_order_and_stages_are_closed():
+    double, inc = Apply("double", lambda x: x * 2), Apply("inc", lambda x: x + 1)
+    pipeline = Pipeline([Source(5), double, inc]).start()
+    assert drain(pipeline) == [1, 3, 5, 7, 9]
+    pipeline.stop()
+    assert double.closed and inc.closed
+
+
+def test_none_drops_an_item():
+    pipeline = Pipeline([Source(6), Apply("odd", lambda x: x if x % 2 else None)]).start()
+    assert drain(pipeline) == [1, 3, 5]
+
+
+def test_failed_stage_error_is_raised_by_get():
+    def fail_on_three(x):
+        if x == 3:
+            raise RuntimeError("boom")
+        return x
+
+    pipeline = Pipeline([Source(10), Apply("fail", fail_on_three)]).start()
+    with pytest.raises(RuntimeError, match="boom"):
+        drain(pipeline)
+    assert pipeline.closed
+
+
+def test_stop_ends_blocked_stages():
+    release = threading.Event()
+    pipeline = Pipeline([Source(1000), Apply("slow", lambda x: release.wait(0.01) or x)], poll_interval=0.01).start()
+    assert pipeline.get(5) == 0
+    pipeline.stop(timeout=2)
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    assert pipeline.get() is None
+
+
+def test_bounded_queues_hold_back_the_source():
+    gate = threading.Event()
+    produced = []
+
+    class Counting(Source):
+        def process(self, item):
+            item = super().process(item)
+            if item is not STOP:
+                produced.append(item)
+            return item
+
+    pipeline = Pipeline([Counting(100), Apply("gate", lambda x: gate.wait() and x)], queue_size=1).start()
+    # One item in the gate stage, one queued before it and one waiting to be queued
+    threading.Event().wait(0.2)
+    assert len(produced) <= 3
+    gate.set()
+    assert drain(pipeline) == list(range(100))
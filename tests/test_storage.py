@@ -0,0 +1,71 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app.storage import SnapshotStore
+
+NOW = datetime(2024, 5, 10, 12, 30)
+
+
+def write(store, when, size=100, track_id=1):
+    path = store.path_for(track_id, now=when)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    store.record(path, size)
+    return path
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        stores.append(SnapshotStore(str(tmp_path), retention_interval=3600, **kwargs))
+        return stores[-1]
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_paths_are_sharded_by_hour_and_unique(make_store, tmp_path):
+    store = make_store()
+    first, second = store.path_for(7, now=NOW), store.path_for(7, now=NOW)
+    assert first != second
+    assert os.path.dirname(first) == os.path.join(str(tmp_path), "2024-05-10", "12")
+    event_id = os.path.splitext(os.path.basename(write(store, NOW)))[0].removeprefix("vehicle_")
+    assert store.lookup(event_id) is not None
+
+
+def test_retention_days_removes_old_hours(make_store):
+    store = make_store(retention_days=1)
+    old = write(store, datetime(2024, 5, 9, 11))
+    kept = write(store, datetime(2024, 5, 9, 13))
+    assert store.enforce_retention(now=NOW) == 1
+    assert not os.path.exists(old) and os.path.exists(kept)
+    assert store.stats() == {"snapshots": 1, "bytes": 100, "deleted": 1}
+
+
+def test_max_bytes_removes_oldest_hours_first(make_store):
+    store = make_store(max_bytes=250)
+    paths = [write(store, datetime(2024, 5, 10, hour)) for hour in (9, 10, 11)]
+    assert store.enforce_retention(now=NOW) == 1
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    # The day directory stays while it still has hours
+    assert os.path.isdir(os.path.dirname(os.path.dirname(paths[0])))
+
+
+def test_current_hour_is_never_deleted(make_store):
+    store = make_store(max_bytes=10)
+    current = write(store, NOW, size=1000)
+    assert store.enforce_retention(now=NOW) == 0
+    assert os.path.exists(current)
+
+
+def test_empty_day_directories_are_removed(make_store, tmp_path):
+    store = make_store(retention_days=1)
+    write(store, datetime(2024, 5, 1, 8))
+    store.enforce_retention(now=NOW)
+    assert not os.path.exists(os.path.join(str(tmp_path), "2024-05-01"))
@@ -0,0 +1,44 @@
+from app.tracks import TrackStore
+
+
+def test_tracks_not_seen_for_max_age_frames_are_evicted():
+    tracks = TrackStore(max_age_frames=2)
+    tracks.touch(1, now=0)
+    tracks.touch(2, now=0)
+    for _ in range(2):
+        tracks.next_frame(now=0)
+        tracks.touch(2, now=0)
+    assert 1 in tracks
+    tracks.next_frame(now=0)
+    assert 1 not in tracks and 2 in tracks
+    assert tracks.stats() == {"active": 1, "evicted": 1}
+
+
+def test_tracks_are_evicted_after_ttl():
+    tracks = TrackStore(max_age_frames=None, ttl=5)
+    tracks.touch(1, now=0)
+    tracks.touch(2, now=4)
+    tracks.next_frame(now=6)
+    assert 1 not in tracks and 2 in tracks
+
+
+def test_touch_keeps_state_and_moves_track_to_the_back():
+    tracks = TrackStore(max_age_frames=1)
+    state = tracks.touch(1, now=0)
+    tracks.touch(2, now=0)
+    tracks.next_frame(now=0)
+    assert tracks.touch(1, now=0) is state
+    tracks.next_frame(now=0)
+    tracks.next_frame(now=0)
+    # Track 2 is at the front now, so it goes first even though track 1 is just as stale afterwards
+    assert 2 not in tracks
+
+
+def test_remap_renumbers_bits_and_drops_missing_indexes():
+    tracks = TrackStore()
+    state = tracks.touch(1, now=0)
+    state.visits = (0, 1)
+    state.counted = 0b11
+    tracks.remap({1: 0}, {0: 2})
+    assert state.visits == (0,)
+    assert state.counted == 0b100
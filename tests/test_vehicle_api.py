@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from app.api import vehicle as api
+from app.cache import LocalGeneration, TTLCache
+
+
+class FakeSession:
+    """AsyncSession stand-in: records statements and returns the given rows from scalars()."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = []
+        self.executed = []
+        self.committed = False
+
+    async def scalars(self, query):
+        self.queries.append(query)
+        return list(self.rows)
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    async def commit(self):
+        self.committed = True
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(api, "cache", TTLCache(generation=LocalGeneration()))
+
+
+def make_vehicle(vehicle_id, created_at):
+    return SimpleNamespace(id=vehicle_id, createdAt=created_at, updatedAt=created_at, trackId=str(vehicle_id),
+                           direction="up", image_path=None, camera="cam")
+
+
+def compiled(query):
+    return query.compile(compile_kwargs={"literal_binds": True}).string
+
+
+def test_full_page_returns_cursor_of_its_last_row():
+    rows = [make_vehicle(9, datetime(2024, 5, 1, 10)), make_vehicle(8, datetime(2024, 5, 1, 9))]
+    db, response = FakeSession(rows), Response()
+    vehicles = asyncio.run(api.get_vehicles(response, limit=2, db=db))
+    assert [v.id for v in vehicles] == [9, 8]
+    assert api.decode_cursor(response.headers["X-Next-Cursor"]) == (datetime(2024, 5, 1, 9), 8)
+    assert 'ORDER BY vehicles."createdAt" DESC, vehicles.id DESC' in compiled(db.queries[0])
+
+
+def test_short_page_has_no_cursor():
+    response = Response()
+    asyncio.run(api.get_vehicles(response, limit=2, db=FakeSession([make_vehicle(1, datetime(2024, 5, 1))])))
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_seeks_past_the_previous_page_instead_of_offset():
+    cursor = api.encode_cursor(make_vehicle(8, datetime(2024, 5, 1, 9)))
+    db = FakeSession()
+    asyncio.run(api.get_vehicles(Response(), skip=50, limit=2, cursor=cursor, db=db))
+    sql = compiled(db.queries[0])
+    assert '(vehicles."createdAt", vehicles.id) < (\'2024-05-01 09:00:00\', 8)' in sql
+    assert "OFFSET" not in sql
+
+
+def test_invalid_cursor_is_a_400():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.get_vehicles(Response(), cursor="not-a-cursor", db=FakeSession()))
+    assert error.value.status_code == 400
+
+
+def make_request(body, content_type="application/json", chunk_size=7):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {"type": "http", "method": "POST", "path": "/vehicles/bulk", "query_string": b"",
+             "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def inserted_rows(db):
+    # Vehicle inserts are executed with a list of rows; rollup upserts without
+    return [row for statement, params in db.executed if params is not None for row in params]
+
+
+def test_bulk_json_array_inserts_valid_rows_and_reports_invalid_ones(monkeypatch):
+    monkeypatch.setattr(api, "BULK_BATCH_SIZE", 2)
+    body = (b'[{"trackId": "1", "direction": "up", "image_path": "a.jpg"},'
+            b' {"trackId": "2", "direction": "up"},'
+            b' {"trackId": "3", "direction": "down", "image_path": "c.jpg", "createdAt": "2024-05-01T08:00:00+07:00"},'
+            b' {"trackId": "4", "direction": "down", "image_path": "d.jpg"}]')
+    db = FakeSession()
+    result = asyncio.run(api.create_vehicles_bulk(make_request(body), db=db))
+    assert (result["inserted"], result["rejected"]) == (3, 1)
+    assert result["errors"][0]["index"] == 1
+    rows = inserted_rows(db)
+    assert [row["trackId"] for row in rows] == ["1", "3", "4"]
+    # Offsets are stored as naive UTC; rows without createdAt get the request time
+    assert rows[1]["createdAt"] == datetime(2024, 5, 1, 1, 0)
+    assert rows[0]["createdAt"] == rows[0]["updatedAt"] == rows[2]["createdAt"]
+    assert sum(params is not None for _, params in db.executed) == 2  # batches of BULK_BATCH_SIZE
+    assert db.committed
+
+
+def test_bulk_ndjson_is_read_line_by_line_across_chunks():
+    body = (b'{"trackId": "1", "direction": "up", "image_path": "a.jpg"}\n'
+            b'not json\n'
+            b'\n'
+            b'{"trackId": "2", "direction": "up", "image_path": "b.jpg"}')
+    db = FakeSession()
+    result = asyncio.run(api.create_vehicles_bulk(make_request(body, "application/x-ndjson", chunk_size=5), db=db))
+    assert (result["inserted"], result["rejected"]) == (2, 1)
+    assert result["errors"][0]["index"] == 1
+    assert [row["trackId"] for row in inserted_rows(db)] == ["1", "2"]
+
+
+@pytest.mark.parametrize("body", [b'{"trackId": "1"}', b"[1, 2"])
+def test_bulk_body_must_be_an_array_or_ndjson(body):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.create_vehicles_bulk(make_request(body), db=FakeSession()))
+    assert error.value.status_code == 400
@@ -0,0 +1,80 @@
+import pytest
+
+from app.zone_config import DEFAULT_RULES, DEFAULT_ZONES, MAX_ZONES, VersionConflict, ZoneStore, ZoneWatcher, validate
+
+TRIANGLE = [[0, 0], [10, 0], [0, 10]]
+
+
+def test_validate_normalises_points():
+    zones, rules = validate({"a": [[0.4, 0.6], (10, 0), [0, 10]]})
+    assert zones == {"a": [[0, 1], [10, 0], [0, 10]]}
+    assert rules is None
+
+
+@pytest.mark.parametrize("zones", [
+    {},
+    [],
+    {"a": TRIANGLE[:2]},
+    {"a": [[0, 0], [1, 0], [0, True]]},
+    {"a": [[0, 0], [1, 0], "x"]},
+    {f"z{i}": TRIANGLE for i in range(MAX_ZONES + 1)},
+])
+def test_validate_rejects_bad_zones(zones):
+    with pytest.raises(ValueError):
+        validate(zones)
+
+
+@pytest.mark.parametrize("rules", [
+    {"name": "x"},
+    [{"zones": ["a"]}],
+    [{"name": "x", "zones": ["a"]}, {"name": "x", "zones": ["a"]}],
+    [{"name": "x", "zones": ["a"], "line": [[0, 0], [1, 1]]}],
+    [{"name": "x", "line": [[0, 0]]}],
+    [{"name": "x", "zones": ["missing"]}],
+])
+def test_validate_rejects_bad_rules(rules):
+    with pytest.raises(ValueError):
+        validate({"a": TRIANGLE}, rules)
+
+
+def test_validate_rules():
+    _, rules = validate({"a": TRIANGLE}, [{"name": "in", "zones": ["a"]}, {"name": "l", "line": [[0, 0], [5.6, 5]]}])
+    assert rules == [{"name": "in", "zones": ["a"]}, {"name": "l", "line": [[0, 0], [6, 5]]}]
+
+
+def test_default_zones_satisfy_default_rules():
+    validate(DEFAULT_ZONES, DEFAULT_RULES)
+
+
+def test_store_versions_and_conflicts(tmp_path):
+    store = ZoneStore(str(tmp_path))
+    assert store.load("cam") is None
+    assert store.save("cam", {"a": TRIANGLE})["version"] == 1
+    assert store.save("cam", {"a": TRIANGLE}, expected_version=1)["version"] == 2
+    with pytest.raises(VersionConflict) as conflict:
+        store.save("cam", {"a": TRIANGLE}, expected_version=1)
+    assert conflict.value.current == 2
+    assert store.versions("cam") == [1, 2]
+    assert store.load("cam", 1)["version"] == 1
+
+
+def test_store_checks_zones_against_default_rules(tmp_path):
+    store = ZoneStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.save("cam", {"a": TRIANGLE}, default_rules=DEFAULT_RULES)
+    assert store.save("cam", DEFAULT_ZONES, default_rules=DEFAULT_RULES)["rules"] is None
+
+
+def test_store_rejects_path_like_camera_names(tmp_path):
+    with pytest.raises(ValueError):
+        ZoneStore(str(tmp_path)).save("../cam", {"a": TRIANGLE})
+
+
+def test_watcher_returns_each_new_version_once(tmp_path):
+    store = ZoneStore(str(tmp_path))
+    watcher = ZoneWatcher(store, "cam", interval=1.0)
+    assert watcher.poll(now=0) is None
+    store.save("cam", {"a": TRIANGLE})
+    assert watcher.poll(now=0.5) is None  # within the poll interval
+    assert watcher.poll(now=1.0)["version"] == 1
+    assert watcher.poll(now=2.0) is None
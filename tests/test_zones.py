@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.zones import ZoneIndex
+
+ZONES = {
+    "left": [(0, 0), (60, 0), (60, 40), (0, 40)],
+    "right": [(40, 0), (100, 0), (100, 40), (40, 40)],
+}
+
+
+def test_overlapping_zones_have_separate_bits():
+    zones = ZoneIndex(ZONES, size=(120, 60))
+    assert zones.membership([(10, 10), (50, 10), (90, 10), (10, 50)]).tolist() == [
+        [True, False], [True, True], [False, True], [False, False]]
+    assert zones.contains((50, 20), "right")
+
+
+def test_points_outside_the_frame_are_in_no_zone():
+    zones = ZoneIndex(ZONES, size=(120, 60))
+    assert zones.labels([(-1, 10), (10, -5), (120, 10), (10, 60)]).tolist() == [0, 0, 0, 0]
+
+
+def test_label_dtype_grows_with_zone_count():
+    many = {f"z{i}": [(i, 0), (i + 1, 0), (i + 1, 1)] for i in range(9)}
+    assert ZoneIndex(many, size=(20, 10)).dtype == np.uint16
+
+
+def test_updated_reuses_unchanged_masks():
+    zones = ZoneIndex(ZONES, size=(120, 60))
+    moved = zones.updated(dict(ZONES, right=[(80, 0), (100, 0), (100, 40), (80, 40)]))
+    assert moved.masks["left"] is zones.masks["left"]
+    assert moved.masks["right"] is not zones.masks["right"]
+    assert not moved.contains((50, 20), "right")
+
+
+def test_bounding_rect_is_padded_and_clipped():
+    zones = ZoneIndex(ZONES, size=(120, 60))
+    assert zones.bounding_rect() == (0, 0, 101, 41)
+    assert zones.bounding_rect(10) == (0, 0, 111, 51)
+
+
+def test_centroids():
+    assert ZoneIndex.centroids([[0, 0, 10, 20], [5, 5, 6, 6]]).tolist() == [[5, 10], [5, 5]]